@@ -123,13 +123,17 @@ class ASR(sb.core.Brain):
         # if so change the optimizer from Adam to SGD
         self.check_and_reset_optimizer()
 
-        predictions = self.compute_forward(batch, sb.Stage.TRAIN)
-        loss = self.compute_objectives(predictions, batch, sb.Stage.TRAIN)
+        should_step = self.step % self.hparams.gradient_accumulation == 0
 
-        # normalize the loss by gradient_accumulation step
-        (loss / self.hparams.gradient_accumulation).backward()
+        # gradients are only all-reduced on the step that updates the weights
+        with self.no_sync(not should_step):
+            predictions = self.compute_forward(batch, sb.Stage.TRAIN)
+            loss = self.compute_objectives(predictions, batch, sb.Stage.TRAIN)
 
-        if self.step % self.hparams.gradient_accumulation == 0:
+            # normalize the loss by gradient_accumulation step
+            (loss / self.hparams.gradient_accumulation).backward()
+
+        if should_step:
             # gradient clipping & early stop if loss is not fini
             self.check_gradients(loss)
 
@@ -13,7 +13,6 @@ Authors
 """
 import os
 import sys
-import torch
 import logging
 import speechbrain as sb
 from hyperpyyaml import load_hyperpyyaml
@@ -26,20 +25,13 @@ logger = logging.getLogger(__name__)
 class ASR_Brain(sb.Brain):
     def compute_forward(self, batch, stage):
         "Given an input batch it computes the phoneme probabilities."
-        batch = batch.to(self.device)
+        batch = batch.to(self.device, non_blocking=True)
         wavs, wav_lens = batch.sig
         phns, phn_lens = batch.phn_encoded
 
         # Adding optional augmentation when specified:
+        # (env_corrupt is handled in fit_batch)
         if stage == sb.Stage.TRAIN:
-            if hasattr(self.hparams, "env_corrupt"):
-                wavs_noise = self.hparams.env_corrupt(wavs, wav_lens)
-                wavs = torch.cat([wavs, wavs_noise], dim=0)
-                wav_lens = torch.cat([wav_lens, wav_lens])
-                batch.sig = wavs, wav_lens
-                phns = torch.cat([phns, phns], dim=0)
-                phn_lens = torch.cat([phn_lens, phn_lens])
-                batch.phn_encoded = phns, phn_lens
             if hasattr(self.hparams, "augmentation"):
                 wavs = self.hparams.augmentation(wavs, wav_lens)
 
@@ -80,6 +72,41 @@ class ASR_Brain(sb.Brain):
             return p_transducer, best_hyps
         return p_transducer
 
+    def fit_batch(self, batch):
+        """Train on the clean batch and on its env_corrupt noisy copy.
+
+        Rather than concatenating the two into one double-size batch, each
+        half is forwarded and back-propagated on its own, which halves the
+        peak activation memory. The half losses are averaged, as the mean
+        loss over the concatenated batch would be.
+        """
+        if not hasattr(self.hparams, "env_corrupt"):
+            return super().fit_batch(batch)
+
+        batch = batch.to(self.device, non_blocking=True)
+        wavs, wav_lens = batch.sig
+        wavs_noise = self.hparams.env_corrupt(wavs, wav_lens)
+
+        total_loss = 0.0
+        for i, sig in enumerate([(wavs, wav_lens), (wavs_noise, wav_lens)]):
+            batch.sig = sig
+            # DDP all-reduces the gradients only after the second half
+            with self.no_sync(i == 0):
+                with self._autocast(enabled=self.auto_mix_prec):
+                    outputs = self.compute_forward(batch, sb.Stage.TRAIN)
+                    loss = self.compute_objectives(
+                        outputs, batch, sb.Stage.TRAIN
+                    )
+                loss = loss / 2
+                if self.auto_mix_prec:
+                    self.scaler.scale(loss).backward()
+                else:
+                    loss.backward()
+            total_loss += loss.detach()
+        self._optimizer_step(total_loss)
+
+        return total_loss.cpu()
+
     def compute_objectives(self, predictions, batch, stage):
         "Given the network predictions and targets computed the loss."
         ids = batch.id
@@ -26,7 +26,7 @@ logger = logging.getLogger(__name__)
 class ASR_Brain(sb.Brain):
     def compute_forward(self, batch, stage):
         "Given an input batch it computes the phoneme probabilities."
-        batch = batch.to(self.device)
+        batch = batch.to(self.device, non_blocking=True)
         wavs, wav_lens = batch.sig
         phns, phn_lens = batch.phn_encoded
 
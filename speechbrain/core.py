@@ -17,6 +17,7 @@ import inspect
 import pathlib
 import argparse
 import tempfile
+import contextlib
 import speechbrain as sb
 from datetime import date
 from enum import Enum, auto
@@ -37,9 +38,9 @@ from speechbrain.dataio.sampler import ReproducibleRandomSampler
 logger = logging.getLogger(__name__)
 DEFAULT_LOG_CONFIG = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_LOG_CONFIG = os.path.join(DEFAULT_LOG_CONFIG, "log-config.yaml")
-torch._C._jit_set_profiling_executor(False)
-torch._C._jit_set_profiling_mode(False)
 INTRA_EPOCH_CKPT_FLAG = "brain_intra_epoch_ckpt"
+# Unlike no_grad, inference_mode (torch>=1.9) also skips version counting
+_inference_mode = getattr(torch, "inference_mode", torch.no_grad)
 
 
 def create_experiment_directory(
@@ -224,12 +225,38 @@ def parse_arguments(arg_list):
         nargs="*",
         help="A list of keys in the 'modules' dict to jitify",
     )
+    parser.add_argument(
+        "--compile_module_keys",
+        type=str,
+        nargs="*",
+        help="A list of keys in the 'modules' dict to compile with "
+        "torch.compile (requires torch >= 2.0)",
+    )
+    parser.add_argument(
+        "--compile_mode",
+        type=str,
+        help="The torch.compile mode of the compile_module_keys, one of "
+        "{default, reduce-overhead, max-autotune}",
+    )
     parser.add_argument(
         "--auto_mix_prec",
         default=False,
         action="store_true",
         help="This flag enables training with automatic mixed-precision.",
     )
+    parser.add_argument(
+        "--auto_mix_prec_dtype",
+        type=str,
+        help="Data type used with automatic mixed-precision: "
+        "'float16' (with gradient scaling) or 'bfloat16'.",
+    )
+    parser.add_argument(
+        "--prefetch_to_device",
+        default=False,
+        action="store_true",
+        help="This flag enables copying the next batch to the device "
+        "while the current one is processed.",
+    )
     parser.add_argument(
         "--max_grad_norm",
         type=float,
@@ -374,6 +401,14 @@ class Brain:
             If a non-positive number is passed, all epochs are run.
         jit_module_keys (list of str)
             List of keys in ``modules`` that should be jit compiled.
+        compile_module_keys (list of str)
+            List of keys in ``modules`` whose forward should be compiled
+            with ``torch.compile`` (requires torch >= 2.0). The
+            ``forward_step`` of autoregressive decoders, which the searchers
+            call instead of ``forward``, is compiled as well.
+        compile_mode (str)
+            The ``torch.compile`` mode, e.g. ``reduce-overhead`` to replay
+            the compiled graphs with CUDA graphs. Default ``default``.
         distributed_count (int)
             Number of devices to run on.
         distributed_backend (str)
@@ -383,6 +418,14 @@ class Brain:
         auto_mix_prec (bool)
             If ``True``, automatic mixed-precision is used.
             Activate it only with cuda.
+        auto_mix_prec_dtype (str)
+            The low precision type used with ``auto_mix_prec``, one of
+            ``float16`` (default, uses gradient scaling) or ``bfloat16``
+            (same range as float32, so no gradient scaling is needed).
+        prefetch_to_device (bool)
+            If ``True``, batches are moved to the device one step ahead,
+            on a separate CUDA stream when running on cuda.
+            Default: ``False``.
         max_grad_norm (float)
             Default implementation of ``fit_batch()`` uses
             ``clip_grad_norm_`` with this value. Default: ``5``.
@@ -433,7 +476,11 @@ class Brain:
             "distributed_launch": False,
             "distributed_backend": "nccl",
             "jit_module_keys": None,
+            "compile_module_keys": None,
+            "compile_mode": "default",
             "auto_mix_prec": False,
+            "auto_mix_prec_dtype": "float16",
+            "prefetch_to_device": False,
             "max_grad_norm": 5.0,
             "nonfinite_patience": 3,
             "noprogressbar": False,
@@ -503,7 +550,22 @@ class Brain:
 
         # Automatic mixed precision init
         if self.auto_mix_prec:
-            self.scaler = torch.cuda.amp.GradScaler()
+            if self.auto_mix_prec_dtype not in ["float16", "bfloat16"]:
+                raise ValueError(
+                    "auto_mix_prec_dtype must be 'float16' or 'bfloat16', "
+                    f"got {self.auto_mix_prec_dtype}"
+                )
+            # autocast only takes a dtype from torch 1.10
+            if self.auto_mix_prec_dtype == "bfloat16" and not hasattr(
+                torch, "get_autocast_gpu_dtype"
+            ):
+                raise ValueError(
+                    "auto_mix_prec_dtype 'bfloat16' requires torch >= 1.10"
+                )
+            # A disabled GradScaler passes through to the optimizer
+            self.scaler = torch.cuda.amp.GradScaler(
+                enabled=self.auto_mix_prec_dtype == "float16"
+            )
 
         # List parameter count for the user
         total_params = sum(
@@ -827,24 +889,47 @@ class Brain:
         # Managing automatic mixed precision
         if self.auto_mix_prec:
             self.optimizer.zero_grad()
-            with torch.cuda.amp.autocast():
+            with self._autocast():
                 outputs = self.compute_forward(batch, Stage.TRAIN)
                 loss = self.compute_objectives(outputs, batch, Stage.TRAIN)
             self.scaler.scale(loss).backward()
-            self.scaler.unscale_(self.optimizer)
-            if self.check_gradients(loss):
-                self.scaler.step(self.optimizer)
-            self.scaler.update()
         else:
             outputs = self.compute_forward(batch, Stage.TRAIN)
             loss = self.compute_objectives(outputs, batch, Stage.TRAIN)
             loss.backward()
-            if self.check_gradients(loss):
-                self.optimizer.step()
-            self.optimizer.zero_grad()
+        self._optimizer_step(loss)
 
         return loss.detach().cpu()
 
+    def _optimizer_step(self, loss):
+        """Steps the optimizer with the gradients of loss, unscaled when
+        using ``auto_mix_prec``, if ``check_gradients`` allows it, then
+        zeroes the gradients.
+
+        Arguments
+        ---------
+        loss : tensor
+            The loss tensor after ``backward()`` has been called.
+        """
+        if self.auto_mix_prec:
+            self.scaler.unscale_(self.optimizer)
+            if self.check_gradients(loss):
+                self.scaler.step(self.optimizer)
+            self.scaler.update()
+        elif self.check_gradients(loss):
+            self.optimizer.step()
+        self.optimizer.zero_grad()
+
+    def _autocast(self, enabled=True):
+        """Returns the autocast context for ``auto_mix_prec_dtype``. The
+        dtype is only passed for bfloat16, as torch < 1.10 does not take it.
+        """
+        if self.auto_mix_prec_dtype == "bfloat16":
+            return torch.cuda.amp.autocast(
+                enabled=enabled, dtype=torch.bfloat16
+            )
+        return torch.cuda.amp.autocast(enabled=enabled)
+
     def check_gradients(self, loss):
         """Check if gradients are finite and not too large.
 
@@ -1003,7 +1088,7 @@ class Brain:
             # Only show progressbar if requested and main_process
             enable = progressbar and sb.utils.distributed.if_main_process()
             with tqdm(
-                train_set,
+                self._maybe_prefetch(train_set),
                 initial=self.step,
                 dynamic_ncols=True,
                 disable=not enable,
@@ -1039,9 +1124,11 @@ class Brain:
                 self.on_stage_start(Stage.VALID, epoch)
                 self.modules.eval()
                 avg_valid_loss = 0.0
-                with torch.no_grad():
+                with _inference_mode():
                     for batch in tqdm(
-                        valid_set, dynamic_ncols=True, disable=not enable
+                        self._maybe_prefetch(valid_set),
+                        dynamic_ncols=True,
+                        disable=not enable,
                     ):
                         self.step += 1
                         loss = self.evaluate_batch(batch, stage=Stage.VALID)
@@ -1064,6 +1151,12 @@ class Brain:
             if self.debug and epoch == self.debug_epochs:
                 break
 
+    def _maybe_prefetch(self, dataloader):
+        """Wraps the DataLoader in a PrefetchLoader if requested."""
+        if not self.prefetch_to_device:
+            return dataloader
+        return sb.dataio.dataloader.PrefetchLoader(dataloader, self.device)
+
     def _save_intra_epoch_ckpt(self):
         """Saves a CKPT with specific intra-epoch flag."""
         self.checkpointer.save_and_keep_only(
@@ -1075,17 +1168,47 @@ class Brain:
         )
 
     def _compile_jit(self):
-        """Compile requested modules with ``torch.jit.script``."""
-        if self.jit_module_keys is None:
-            return
+        """Compile requested modules with ``torch.jit.script`` or
+        ``torch.compile``."""
+        if self.jit_module_keys is not None:
+            # The scripted modules (e.g. LiGRU) run with the legacy executor,
+            # which is only switched on (for the whole process) when needed
+            torch._C._jit_set_profiling_executor(False)
+            torch._C._jit_set_profiling_mode(False)
+            for name in self.jit_module_keys:
+                if name not in self.modules:
+                    raise ValueError(
+                        "module"
+                        + name
+                        + " is not defined in your hparams file."
+                    )
+                module = torch.jit.script(self.modules[name])
+                self.modules[name] = module.to(self.device)
 
-        for name in self.jit_module_keys:
-            if name not in self.modules:
+        if self.compile_module_keys is not None:
+            if not hasattr(torch, "compile"):
                 raise ValueError(
-                    "module" + name + " is not defined in your hparams file."
+                    "compile_module_keys requires torch >= 2.0, found "
+                    + torch.__version__
                 )
-            module = torch.jit.script(self.modules[name])
-            self.modules[name] = module.to(self.device)
+            for name in self.compile_module_keys:
+                if name not in self.modules:
+                    raise ValueError(
+                        "module"
+                        + name
+                        + " is not defined in your hparams file."
+                    )
+                # Only the methods are replaced, so that the module (and the
+                # parameter names in its checkpoints) stays the same
+                module = self.modules[name]
+                for method in ("forward", "forward_step"):
+                    if hasattr(module, method):
+                        compiled = torch.compile(
+                            getattr(module, method),
+                            mode=self.compile_mode,
+                            dynamic=True,
+                        )
+                        setattr(module, method, compiled)
 
     def _wrap_distributed(self):
         """Wrap modules with distributed wrapper when requested."""
@@ -1113,6 +1236,26 @@ class Brain:
                         )
                     self.modules[name] = module
 
+    @contextlib.contextmanager
+    def no_sync(self, use=True):
+        """Skips the gradient synchronization of DDP-wrapped modules.
+
+        Useful for gradient accumulation: the forward and backward of every
+        step but the last one before ``optimizer.step()`` can be run inside
+        this context, so that the gradients are all-reduced only once.
+
+        Arguments
+        ---------
+        use : bool
+            If False, the gradients are synchronized as usual.
+        """
+        with contextlib.ExitStack() as stack:
+            if use:
+                for module in self.modules.values():
+                    if isinstance(module, DDP):
+                        stack.enter_context(module.no_sync())
+            yield
+
     def evaluate(
         self,
         test_set,
@@ -1159,9 +1302,11 @@ class Brain:
         self.on_stage_start(Stage.TEST, epoch=None)
         self.modules.eval()
         avg_test_loss = 0.0
-        with torch.no_grad():
+        with _inference_mode():
             for batch in tqdm(
-                test_set, dynamic_ncols=True, disable=not progressbar
+                self._maybe_prefetch(test_set),
+                dynamic_ncols=True,
+                disable=not progressbar,
             ):
                 self.step += 1
                 loss = self.evaluate_batch(batch, stage=Stage.TEST)
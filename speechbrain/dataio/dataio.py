@@ -129,6 +129,10 @@ def load_data_csv(csv_path, replacements={}):
         result = {}
         reader = csv.DictReader(csvfile, skipinitialspace=True)
         variable_finder = re.compile(r"\$([\w.]+)")
+
+        def _replace(match):
+            return str(replacements[match[1]])
+
         for row in reader:
             # ID:
             try:
@@ -143,10 +147,10 @@ def load_data_csv(csv_path, replacements={}):
                 raise ValueError(f"Duplicate id: {data_id}")
             # Replacements:
             for key, value in row.items():
+                if "$" not in value:
+                    continue
                 try:
-                    row[key] = variable_finder.sub(
-                        lambda match: str(replacements[match[1]]), value
-                    )
+                    row[key] = variable_finder.sub(_replace, value)
                 except KeyError:
                     raise KeyError(
                         f"The item {value} requires replacements "
@@ -898,11 +902,10 @@ def prepend_bos_token(label, bos_index):
             [7, 2, 3, 0],
             [7, 4, 5, 6]])
     """
-    new_label = label.long().clone()
-    batch_size = label.shape[0]
-
-    bos = new_label.new_zeros(batch_size, 1).fill_(bos_index)
-    new_label = torch.cat([bos, new_label], dim=1)
+    # No clone needed: torch.cat already returns a new tensor
+    label = label.long()
+    bos = label.new_full((label.shape[0], 1), bos_index)
+    new_label = torch.cat([bos, label], dim=1)
     return new_label
 
 
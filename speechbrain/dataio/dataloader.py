@@ -34,6 +34,8 @@ Example
 Authors:
   * Aku Rouhe 2020
 """
+import torch
+import collections
 from torch.utils.data import DataLoader
 from torch.utils.data import IterableDataset
 from torch.utils.data.dataloader import _BaseDataLoaderIter
@@ -42,6 +44,7 @@ import functools
 from speechbrain.dataio.batch import PaddedBatch
 from speechbrain.dataio.dataset import DynamicItemDataset
 from speechbrain.dataio.sampler import ReproducibleRandomSampler
+from speechbrain.utils.data_utils import recursive_to
 from speechbrain.utils.checkpoints import (
     register_checkpoint_hooks,
     mark_as_saver,
@@ -221,3 +224,73 @@ class SaveableDataLoader(DataLoader):
                 return
             else:
                 self._speechbrain_recovery_skip_to = int(saved)
+
+
+class PrefetchLoader:
+    """Wraps a DataLoader and moves each batch to the device ahead of time.
+
+    On CUDA devices, the host-to-device copy of the next batch is issued on a
+    separate stream while the current batch is being processed, so the
+    transfer overlaps with compute. The loader should use ``pin_memory=True``
+    for the copies to be truly asynchronous. On other devices, batches are
+    simply moved to the device as they are yielded.
+
+    Note
+    ----
+    One batch is always fetched ahead, so a SaveableDataLoader checkpoint
+    saved mid-epoch records one more batch than has been processed.
+
+    Arguments
+    ---------
+    loader : iterable
+        The DataLoader (or any iterable of batches) to wrap.
+    device : str, torch.device
+        The device where the batches are moved.
+
+    Example
+    -------
+    >>> loader = SaveableDataLoader(torch.arange(4.), batch_size=2)
+    >>> for batch in PrefetchLoader(loader, "cpu"):
+    ...     print(batch)
+    tensor([0., 1.])
+    tensor([2., 3.])
+    """
+
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = torch.device(device)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        if self.device.type != "cuda":
+            for batch in self.loader:
+                yield recursive_to(batch, self.device)
+            return
+
+        stream = torch.cuda.Stream(device=self.device)
+        next_batch = None
+        for batch in self.loader:
+            with torch.cuda.stream(stream):
+                batch = recursive_to(batch, self.device, non_blocking=True)
+            if next_batch is not None:
+                yield next_batch
+            torch.cuda.current_stream(self.device).wait_stream(stream)
+            _record_stream(batch, torch.cuda.current_stream(self.device))
+            next_batch = batch
+        if next_batch is not None:
+            yield next_batch
+
+
+def _record_stream(data, stream):
+    """Marks all tensors in data as used by stream (for the allocator)."""
+    if isinstance(data, torch.Tensor):
+        if data.is_cuda:
+            data.record_stream(stream)
+    elif isinstance(data, collections.abc.Mapping):
+        for value in data.values():
+            _record_stream(value, stream)
+    elif isinstance(data, (PaddedBatch, list, tuple)):
+        for value in data:
+            _record_stream(value, stream)
@@ -532,7 +532,8 @@ class CategoricalEncoder:
         decoded = []
         # Recursively operates on the different dimensions.
         if x.ndim == 1:  # Last dimension!
-            for element in x:
+            # A single tolist() avoids creating a 0-dim tensor per element
+            for element in x.tolist():
                 decoded.append(self.ind2lab[int(element)])
         else:
             for subtensor in x:
@@ -556,6 +557,12 @@ class CategoricalEncoder:
             ndim list of original labels, or if input was single element,
             output will be, too.
         """
+        if isinstance(x, torch.Tensor):
+            # Plain Python numbers are much cheaper to iterate over
+            x = x.tolist()
+        if isinstance(x, int):
+            # Bottom level, without raising and catching a TypeError
+            return self.ind2lab[x]
         # Recursively operates on the different dimensions.
         try:
             decoded = []
@@ -1,9 +1,9 @@
 """SpeechBrain Extended CSV Compatibility."""
 from speechbrain.dataio.dataset import DynamicItemDataset
-import collections
 import csv
 import pickle
 import logging
+import numpy as np
 import torch
 import torchaudio
 import re
@@ -13,9 +13,38 @@ logger = logging.getLogger(__name__)
 
 TORCHAUDIO_FORMATS = ["wav", "flac", "aac", "ogg", "flac", "mp3"]
 ITEM_POSTFIX = "_data"
+# Tensor types for the element types supported in pkl lists (see read_pkl)
+_PKL_LIST_DTYPES = {float: np.float32, int: np.int64, str: np.int64}
 
-CSVItem = collections.namedtuple("CSVItem", ["data", "format", "opts"])
-CSVItem.__doc__ = """The Legacy Extended CSV Data item triplet"""
+
+class CSVItem:
+    """The Legacy Extended CSV Data item triplet
+
+    Uses __slots__, as one of these is created per triplet per CSV row.
+
+    Arguments
+    ---------
+    data : str, torch.Tensor
+        The data entry (e.g. a file path), or the already read data.
+    format : str
+        The format of the data, which decides how it is read.
+    opts : dict
+        Reading options, parsed from the space separated ``name:value``
+        pairs of the _opts field.
+    """
+
+    __slots__ = ("data", "format", "opts")
+
+    def __init__(self, data, format, opts):
+        self.data = data
+        self.format = format
+        self.opts = opts
+
+    def __repr__(self):
+        return (
+            f"CSVItem(data={self.data!r}, format={self.format!r}, "
+            f"opts={self.opts!r})"
+        )
 
 
 class ExtendedCSVDataset(DynamicItemDataset):
@@ -70,6 +99,10 @@ class ExtendedCSVDataset(DynamicItemDataset):
         CSV data-triplets. E.G. if the CSV has: wav,wav_format,wav_opts,
         then the Dataset has a dynamic item output available with key ``"wav"``
         NOTE: If None, read all existing.
+    cache : bool
+        If True, the audio items of the kept entries are read once here and
+        held in memory, instead of being read from disk on every access.
+        Only sensible for small corpora that fit in RAM.
     """
 
     def __init__(
@@ -81,6 +114,7 @@ class ExtendedCSVDataset(DynamicItemDataset):
         max_duration=36000,
         dynamic_items=[],
         output_keys=[],
+        cache=False,
     ):
         if sorting not in ["original", "ascending", "descending"]:
             clsname = self.__class__.__name__
@@ -94,7 +128,7 @@ class ExtendedCSVDataset(DynamicItemDataset):
         # Handle filtering, sorting:
         reverse = False
         sort_key = None
-        if sorting == "ascending" or "descending":
+        if sorting in ("ascending", "descending"):
             sort_key = "duration"
         if sorting == "descending":
             reverse = True
@@ -105,10 +139,24 @@ class ExtendedCSVDataset(DynamicItemDataset):
             reverse=reverse,
         )
         self.data_ids = filtered_sorted_ids
+        if cache:
+            self._cache_audio(data_names)
         # Handle None output_keys (differently than Base)
         if not output_keys:
             self.set_output_keys(data_names)
 
+    def _cache_audio(self, data_names):
+        """Reads the audio items once and stores them in the data dict."""
+        for data_id in self.data_ids:
+            data_point = self.data[data_id]
+            for name in data_names:
+                item = data_point[name + ITEM_POSTFIX]
+                if item.format in TORCHAUDIO_FORMATS:
+                    audio = _read_csv_item(item)
+                    data_point[name + ITEM_POSTFIX] = CSVItem(
+                        audio, item.format, item.opts
+                    )
+
 
 def load_sb_extended_csv(csv_path, replacements={}):
     """Loads SB Extended CSV and formats string values.
@@ -147,51 +195,62 @@ def load_sb_extended_csv(csv_path, replacements={}):
     """
     with open(csv_path, newline="") as csvfile:
         result = {}
-        reader = csv.DictReader(csvfile, skipinitialspace=True)
+        reader = csv.reader(csvfile, skipinitialspace=True)
+        fieldnames = next(reader)
         variable_finder = re.compile(r"\$([\w.]+)")
-        if not reader.fieldnames[0] == "ID":
+
+        def _replace(match):
+            return replacements[match[1]]
+
+        if not fieldnames[0] == "ID":
             raise KeyError(
                 "CSV has to have an 'ID' field, with unique ids"
                 " for all data points"
             )
-        if not reader.fieldnames[1] == "duration":
+        if not fieldnames[1] == "duration":
             raise KeyError(
                 "CSV has to have an 'duration' field, "
                 "with the length of the data point in seconds."
             )
-        if not len(reader.fieldnames[2:]) % 3 == 0:
+        if not len(fieldnames[2:]) % 3 == 0:
             raise ValueError(
                 "All named fields must have 3 entries: "
                 "<name>, <name>_format, <name>_opts"
             )
-        names = reader.fieldnames[2::3]
+        names = fieldnames[2::3]
         for row in reader:
+            if not row:
+                # Skip empty lines, like csv.DictReader
+                continue
+            if len(row) != len(fieldnames):
+                raise ValueError(
+                    f"Row {row} has {len(row)} fields, "
+                    f"but the header has {len(fieldnames)}"
+                )
             # Make a triplet for each name
             data_point = {}
-            # ID:
-            data_id = row["ID"]
-            del row["ID"]  # This is used as a key in result, instead.
-            # Duration:
-            data_point["duration"] = float(row["duration"])
-            del row["duration"]  # This is handled specially.
+            # ID, used as a key in result:
+            data_id = row[0]
+            # Duration, handled specially:
+            data_point["duration"] = float(row[1])
             if data_id in result:
                 raise ValueError(f"Duplicate id: {data_id}")
-            # Replacements:
-            # Only need to run these in the actual data,
-            # not in _opts, _format
-            for key, value in list(row.items())[::3]:
-                try:
-                    row[key] = variable_finder.sub(
-                        lambda match: replacements[match[1]], value
-                    )
-                except KeyError:
-                    raise KeyError(
-                        f"The item {value} requires replacements "
-                        "which were not supplied."
-                    )
             for i, name in enumerate(names):
-                triplet = CSVItem(*list(row.values())[i * 3 : i * 3 + 3])
-                data_point[name + ITEM_POSTFIX] = triplet
+                data, fmt, opts = row[3 * i + 2 : 3 * i + 5]
+                # Replacements:
+                # Only need to run these in the actual data,
+                # not in _opts, _format
+                if "$" in data:
+                    try:
+                        data = variable_finder.sub(_replace, data)
+                    except KeyError:
+                        raise KeyError(
+                            f"The item {data} requires replacements "
+                            "which were not supplied."
+                        )
+                # Options are static, so they are parsed only once here
+                opts = _parse_csv_item_opts(opts)
+                data_point[name + ITEM_POSTFIX] = CSVItem(data, fmt, opts)
             result[data_id] = data_point
         # Make a DynamicItem for each CSV entry
         # _read_csv_item delegates reading to further
@@ -209,9 +268,13 @@ def load_sb_extended_csv(csv_path, replacements={}):
 def _read_csv_item(item):
     """Reads the different formats supported in SB Extended CSV.
 
-    Delegates to the relevant functions.
+    Delegates to the relevant functions. Audio files are always read
+    whole: the start: and stop: options are not applied.
     """
-    opts = _parse_csv_item_opts(item.opts)
+    if isinstance(item.data, torch.Tensor):
+        # Already read (see ExtendedCSVDataset cache)
+        return item.data
+    opts = item.opts
     if item.format in TORCHAUDIO_FORMATS:
         audio, _ = torchaudio.load(item.data)
         return audio.squeeze(0)
@@ -273,44 +336,40 @@ def read_pkl(file, data_options={}, lab2ind=None):
         err_msg = "cannot read the pkl file %s" % (file)
         raise ValueError(err_msg)
 
-    type_ok = False
-
     if isinstance(pkl_element, list):
-
-        if isinstance(pkl_element[0], float):
-            tensor = torch.FloatTensor(pkl_element)
-            type_ok = True
-
-        if isinstance(pkl_element[0], int):
-            tensor = torch.LongTensor(pkl_element)
-            type_ok = True
-
-        if isinstance(pkl_element[0], str):
-
-            # convert string to integer as specified in self.label_dict
-            if lab2ind is not None:
-                for index, val in enumerate(pkl_element):
-                    pkl_element[index] = lab2ind[val]
-
-            tensor = torch.LongTensor(pkl_element)
-            type_ok = True
-
-        if not (type_ok):
+        for elem_type, dtype in _PKL_LIST_DTYPES.items():
+            if isinstance(pkl_element[0], elem_type):
+                break
+        else:
             err_msg = (
                 "The pkl file %s can only contain list of integers, "
                 "floats, or strings. Got %s"
             ) % (file, type(pkl_element[0]))
             raise ValueError(err_msg)
-    else:
+
+        # convert string to integer as specified in self.label_dict
+        if elem_type is str and lab2ind is not None:
+            pkl_element = [lab2ind[val] for val in pkl_element]
+
+        # NumPy converts lists much faster, and from_numpy shares its memory
+        tensor = torch.from_numpy(np.asarray(pkl_element, dtype=dtype))
+    elif isinstance(pkl_element, torch.Tensor):
         tensor = pkl_element
 
-    tensor_type = tensor.dtype
+        # Conversion to 32 bit (if needed)
+        if tensor.dtype == torch.float64:
+            tensor = tensor.to(torch.float32)
+
+        if tensor.dtype == torch.int64:
+            tensor = tensor.to(torch.int32)
+    else:
+        tensor = pkl_element
 
-    # Conversion to 32 bit (if needed)
-    if tensor_type == "float64":
-        tensor = tensor.astype("float32")
+        # Conversion to 32 bit (if needed)
+        if tensor.dtype == "float64":
+            tensor = tensor.astype("float32")
 
-    if tensor_type == "int64":
-        tensor = tensor.astype("int32")
+        if tensor.dtype == "int64":
+            tensor = tensor.astype("int32")
 
     return tensor
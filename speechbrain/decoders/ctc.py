@@ -89,6 +89,7 @@ class CTCPrefixScorer:
         ---------
         g : torch.Tensor
             The tensor of prefix label sequences, h = g + c.
+            Only its length and its last column are used.
         state : tuple
             Previous ctc states.
         candidates : torch.Tensor
@@ -167,7 +168,6 @@ class CTCPrefixScorer:
             self.minus_inf,
             device=self.device,
         )
-        r.fill_(self.minus_inf)
 
         # (Alg.2-6)
         if prefix_length == 0:
@@ -374,10 +374,23 @@ def ctc_greedy_decode(probabilities, seq_lens, blank_id=-1):
     if isinstance(blank_id, int) and blank_id < 0:
         blank_id = probabilities.shape[-1] + blank_id
     batch_max_len = probabilities.shape[1]
+    scores, predictions = torch.max(probabilities, dim=-1)
+
+    # Apply the CTC rules on the whole batch at once: keep the frames that
+    # are within the sequence, differ from the previous frame and not blank.
+    actual_sizes = torch.round(seq_lens * batch_max_len).to(predictions.device)
+    positions = torch.arange(batch_max_len, device=predictions.device)
+    keep = positions.unsqueeze(0) < actual_sizes.unsqueeze(1)
+    keep[:, 1:] &= predictions[:, 1:] != predictions[:, :-1]
+    if isinstance(blank_id, int):
+        keep &= predictions != blank_id
+
+    # Single transfer, then split the kept tokens into ragged lists
+    tokens = predictions[keep].tolist()
+    counts = keep.sum(dim=1).tolist()
     batch_outputs = []
-    for seq, seq_len in zip(probabilities, seq_lens):
-        actual_size = int(torch.round(seq_len * batch_max_len))
-        scores, predictions = torch.max(seq.narrow(0, 0, actual_size), dim=1)
-        out = filter_ctc_output(predictions.tolist(), blank_id=blank_id)
-        batch_outputs.append(out)
+    start = 0
+    for count in counts:
+        batch_outputs.append(tokens[start : start + count])
+        start += count
     return batch_outputs
@@ -22,10 +22,12 @@ class S2SBaseSearcher(torch.nn.Module):
         The index of the beginning-of-sequence (bos) token.
     eos_index : int
         The index of end-of-sequence token.
-    min_decode_radio : float
+    min_decode_ratio : float
         The ratio of minimum decoding steps to the length of encoder states.
-    max_decode_radio : float
+        The number of steps is rounded down to an int.
+    max_decode_ratio : float
         The ratio of maximum decoding steps to the length of encoder states.
+        The number of steps is rounded down to an int.
 
     Returns
     -------
@@ -155,30 +157,37 @@ class S2SGreedySearcher(S2SBaseSearcher):
     """
 
     def forward(self, enc_states, wav_len):
-        enc_lens = torch.round(enc_states.shape[1] * wav_len).int()
+        enc_lens = (wav_len * enc_states.shape[1]).round_().int()
         device = enc_states.device
         batch_size = enc_states.shape[0]
 
         memory = self.reset_mem(batch_size, device=device)
 
         # Using bos as the first input
-        inp_tokens = (
-            enc_states.new_zeros(batch_size).fill_(self.bos_index).long()
+        inp_tokens = torch.full(
+            (batch_size,), self.bos_index, dtype=torch.long, device=device
         )
 
-        log_probs_lst = []
+        predictions_lst = []
+        scores = enc_states.new_zeros(batch_size)
+        finished = torch.zeros(batch_size, dtype=torch.bool, device=device)
         max_decode_steps = int(enc_states.shape[1] * self.max_decode_ratio)
 
         for t in range(max_decode_steps):
             log_probs, memory, _ = self.forward_step(
                 inp_tokens, memory, enc_states, enc_lens
             )
-            log_probs_lst.append(log_probs)
-            inp_tokens = log_probs.argmax(dim=-1)
+            step_scores, inp_tokens = log_probs.max(dim=-1)
+            predictions_lst.append(inp_tokens)
 
-        log_probs = torch.stack(log_probs_lst, dim=1)
-        scores, predictions = log_probs.max(dim=-1)
-        scores = scores.sum(dim=1).tolist()
+            # The score of each sentence stops at its first eos
+            scores = scores + step_scores.masked_fill(finished, 0.0)
+            finished = finished | inp_tokens.eq(self.eos_index)
+            if finished.all():
+                break
+
+        predictions = torch.stack(predictions_lst, dim=1)
+        scores = scores.tolist()
         predictions = batch_filter_seq2seq_output(
             predictions, eos_id=self.eos_index
         )
@@ -254,16 +263,23 @@ class S2SBeamSearcher(S2SBaseSearcher):
     """This class implements the beam-search algorithm for the seq2seq model.
     See also S2SBaseSearcher().
 
+    By default, enc_states and enc_lens are repeated beam_size times before
+    calling forward_step. Subclasses whose forward_step accepts the original
+    enc_states together with beam_size consecutive hypotheses per sentence
+    can set the ``inflate_enc_states`` class attribute to False.
+
     Arguments
     ---------
     bos_index : int
         The index of beginning-of-sequence token.
     eos_index : int
         The index of end-of-sequence token.
-    min_decode_radio : float
+    min_decode_ratio : float
         The ratio of minimum decoding steps to length of encoder states.
-    max_decode_radio : float
+        The number of steps is rounded down to an int.
+    max_decode_ratio : float
         The ratio of maximum decoding steps to length of encoder states.
+        The number of steps is rounded down to an int.
     beam_size : int
         The width of beam.
     topk : int
@@ -311,6 +327,8 @@ class S2SBeamSearcher(S2SBaseSearcher):
         of the search.
     """
 
+    inflate_enc_states = True
+
     def __init__(
         self,
         bos_index,
@@ -378,14 +396,13 @@ class S2SBeamSearcher(S2SBaseSearcher):
         self.ctc_score_mode = ctc_score_mode
         self.ctc_window_size = ctc_window_size
 
-    def _check_full_beams(self, hyps, beam_size):
+    def _check_full_beams(self, finished, beam_size):
         """This method checks whether hyps has been full.
 
         Arguments
         ---------
-        hyps : List
-            This list contains batch_size number.
-            Each inside list contains a list stores all the hypothesis for this sentence.
+        finished : dict
+            The buffers storing the finished hypotheses (see _init_finished).
         beam_size : int
             The number of beam_size.
 
@@ -394,12 +411,37 @@ class S2SBeamSearcher(S2SBaseSearcher):
         bool
             Whether the hyps has been full.
         """
-        hyps_len = [len(lst) for lst in hyps]
-        beam_size = [self.beam_size for _ in range(len(hyps_len))]
-        if hyps_len == beam_size:
-            return True
-        else:
-            return False
+        return bool(torch.all(finished["count"] == beam_size))
+
+    def _init_finished(self, batch_size, device):
+        """This method allocates the buffers storing the finished hypotheses.
+
+        The hypotheses of each sentence are stored in the order in which they
+        reach eos. Each buffer has one extra slot per sentence, which
+        collects the hypotheses that arrive once all the others are taken.
+
+        Arguments
+        ---------
+        batch_size : int
+            The number of sentences.
+        device : torch.device
+            The device of the buffers.
+
+        Returns
+        -------
+        finished : dict
+            The number of finished hypotheses ("count"), and the beam row
+            ("rows"), length ("lengths") and final score ("scores") of each
+            of them. The tokens are recovered from the row and the length
+            by following the parent pointers of the beams.
+        """
+        shape = (batch_size, self.beam_size + 1)
+        return {
+            "count": torch.zeros(batch_size, dtype=torch.long, device=device),
+            "rows": torch.zeros(shape, dtype=torch.long, device=device),
+            "lengths": torch.zeros(shape, dtype=torch.int, device=device),
+            "scores": torch.zeros(shape, device=device),
+        }
 
     def _check_attn_shift(self, attn, prev_attn_peak):
         """This method checks whether attention shift is more than attn_shift.
@@ -442,19 +484,13 @@ class S2SBeamSearcher(S2SBaseSearcher):
         cond : torch.BoolTensor
             Each element represents whether the eos log-probabilities will be kept.
         """
-        max_probs, _ = torch.max(log_probs, dim=-1)
+        max_probs = log_probs.amax(dim=-1)
         eos_probs = log_probs[:, self.eos_index]
         cond = eos_probs > (self.eos_threshold * max_probs)
         return cond
 
     def _update_hyp_and_scores(
-        self,
-        inp_tokens,
-        alived_seq,
-        alived_log_probs,
-        hyps_and_scores,
-        scores,
-        timesteps,
+        self, inp_tokens, length, finished, scores, timesteps,
     ):
         """This method will update hyps and scores if inp_tokens are eos.
 
@@ -462,12 +498,10 @@ class S2SBeamSearcher(S2SBaseSearcher):
         ---------
         inp_tokens : torch.Tensor
             The current output.
-        alived_seq : torch.Tensor
-            The tensor to store the alived_seq.
-        alived_log_probs : torch.Tensor
-            The tensor to store the alived_log_probs.
-        hyps_and_scores : list
-            To store generated hypotheses and scores.
+        length : int
+            The current length of the hypotheses.
+        finished : dict
+            The buffers storing the finished hypotheses (see _init_finished).
         scores : torch.Tensor
             The final scores of beam search.
         timesteps : float
@@ -479,31 +513,40 @@ class S2SBeamSearcher(S2SBaseSearcher):
             Each element represents whether the token is eos.
         """
         is_eos = inp_tokens.eq(self.eos_index)
-        (eos_indices,) = torch.nonzero(is_eos, as_tuple=True)
+        batch_size = finished["count"].shape[0]
+        eos = is_eos.view(batch_size, self.beam_size)
+
+        # Slot of each eos hypothesis in the finished buffers. Those arriving
+        # when all beam_size slots are taken go to the extra slot.
+        slots = finished["count"].unsqueeze(1) + eos.cumsum(dim=1) - 1
+        keep = eos & (slots < self.beam_size)
+        slots = slots.masked_fill(~keep, self.beam_size)
+        finished["count"] += keep.sum(dim=1)
 
         # Store the hypothesis and their scores when reaching eos.
-        if eos_indices.shape[0] > 0:
-            for index in eos_indices:
-                # convert to int
-                index = index.item()
-                batch_id = index // self.beam_size
-                if len(hyps_and_scores[batch_id]) == self.beam_size:
-                    continue
-                hyp = alived_seq[index, :]
-                log_probs = alived_log_probs[index, :]
-                final_scores = scores[index] + self.length_rewarding * (
-                    timesteps + 1
-                )
-                hyps_and_scores[batch_id].append((hyp, log_probs, final_scores))
+        final_scores = scores + self.length_rewarding * (timesteps + 1)
+        finished["scores"].scatter_(
+            1, slots, final_scores.view(batch_size, self.beam_size)
+        )
+        finished["lengths"].scatter_(1, slots, length)
+        finished["rows"].scatter_(1, slots, self.beam_rows)
         return is_eos
 
-    def _get_top_score_prediction(self, hyps_and_scores, topk):
+    def _get_top_score_prediction(
+        self, finished, alived_seq, alived_log_probs, parents, topk
+    ):
         """This method sorts the scores and return corresponding hypothesis and log probs.
 
         Arguments
         ---------
-        hyps_and_scores : list
-            To store generated hypotheses and scores.
+        finished : dict
+            The buffers storing the finished hypotheses (see _init_finished).
+        alived_seq : torch.Tensor
+            The token chosen by each beam at each step.
+        alived_log_probs : torch.Tensor
+            The log-probability of the token chosen by each beam at each step.
+        parents : torch.Tensor
+            The beam each beam came from at each step.
         topk : int
             Number of hypothesis to return.
 
@@ -512,45 +555,51 @@ class S2SBeamSearcher(S2SBaseSearcher):
         topk_hyps : torch.Tensor (batch, topk, max length of token_id sequences)
             This tensor stores the topk predicted hypothesis.
         topk_scores : torch.Tensor (batch, topk)
-            The length of each topk sequence in the batch.
-        topk_lengths : torch.Tensor (batch, topk)
             This tensor contains the final scores of topk hypotheses.
+        topk_lengths : torch.Tensor (batch, topk)
+            The length of each topk sequence in the batch.
         topk_log_probs : list
-            The log probabilities of each hypotheses.
+            The log probabilities of each hypotheses, if return_log_probs.
         """
-        top_hyps, top_log_probs, top_scores, top_lengths = [], [], [], []
-        batch_size = len(hyps_and_scores)
-
-        # Collect hypotheses
-        for i in range(len(hyps_and_scores)):
-            hyps, log_probs, scores = zip(*hyps_and_scores[i])
-            top_hyps += hyps
-            top_scores += scores
-            top_log_probs += log_probs
-            top_lengths += [len(hyp) for hyp in hyps]
-        top_hyps = torch.nn.utils.rnn.pad_sequence(
-            top_hyps, batch_first=True, padding_value=0
-        )
-        top_scores = torch.stack((top_scores), dim=0).view(batch_size, -1)
-        top_lengths = torch.tensor(
-            top_lengths, dtype=torch.int, device=top_scores.device
-        )
+        batch_size = finished["count"].shape[0]
+        top_scores = finished["scores"][:, : self.beam_size]
+        top_lengths = finished["lengths"][:, : self.beam_size]
+        max_length = int(top_lengths.max())
+
         # Get topk indices
-        topk_scores, indices = top_scores.topk(self.topk, dim=-1)
-        indices = (indices + self.beam_offset.unsqueeze(1)).view(
-            batch_size * self.topk
-        )
+        topk_scores, indices = top_scores.topk(topk, dim=-1)
+        topk_lengths = torch.gather(top_lengths, dim=1, index=indices)
+        rows = torch.gather(
+            finished["rows"][:, : self.beam_size], dim=1, index=indices
+        ).view(-1)
+        lengths = topk_lengths.view(-1)
+
+        # Follow the parent pointers back from the last step of each
+        # hypothesis to find the beam it was on at every step
+        path = rows.new_empty(batch_size * topk, max_length)
+        for step in reversed(range(max_length)):
+            path[:, step] = rows
+            rows = torch.where(step < lengths, parents[rows, step], rows)
+
         # Select topk hypotheses
-        topk_hyps = torch.index_select(top_hyps, dim=0, index=indices,)
-        topk_hyps = topk_hyps.view(batch_size, self.topk, -1)
-        topk_lengths = torch.index_select(top_lengths, dim=0, index=indices,)
-        topk_lengths = topk_lengths.view(batch_size, self.topk)
-        topk_log_probs = [top_lengths[index.item()] for index in indices]
+        steps = torch.arange(max_length, device=path.device)
+        padding = steps >= lengths.unsqueeze(1)
+        topk_hyps = alived_seq[path, steps].masked_fill(padding, 0)
+        topk_hyps = topk_hyps.view(batch_size, topk, max_length)
+
+        topk_log_probs = None
+        if self.return_log_probs:
+            topk_log_probs = [
+                log_probs[:length]
+                for log_probs, length in zip(
+                    alived_log_probs[path, steps], lengths.tolist()
+                )
+            ]
 
         return topk_hyps, topk_scores, topk_lengths, topk_log_probs
 
     def forward(self, enc_states, wav_len):  # noqa: C901
-        enc_lens = torch.round(enc_states.shape[1] * wav_len).int()
+        enc_lens = (wav_len * enc_states.shape[1]).round_().int()
         device = enc_states.device
         batch_size = enc_states.shape[0]
 
@@ -573,46 +622,53 @@ class S2SBeamSearcher(S2SBaseSearcher):
             )
             ctc_memory = None
 
-        # Inflate the enc_states and enc_len by beam_size times
-        enc_states = inflate_tensor(enc_states, times=self.beam_size, dim=0)
-        enc_lens = inflate_tensor(enc_lens, times=self.beam_size, dim=0)
+        # Inflate the enc_states and enc_len by beam_size times, unless
+        # forward_step can share them across the hypotheses of each beam
+        if self.inflate_enc_states:
+            enc_states = inflate_tensor(enc_states, times=self.beam_size, dim=0)
+            enc_lens = inflate_tensor(enc_lens, times=self.beam_size, dim=0)
 
         # Using bos as the first input
-        inp_tokens = (
-            torch.zeros(batch_size * self.beam_size, device=device)
-            .fill_(self.bos_index)
-            .long()
+        inp_tokens = torch.full(
+            (batch_size * self.beam_size,),
+            self.bos_index,
+            dtype=torch.long,
+            device=device,
         )
 
-        # The first index of each sentence.
-        self.beam_offset = (
-            torch.arange(batch_size, device=device) * self.beam_size
-        )
+        # The index of each beam, and the first index of each sentence.
+        self.beam_rows = torch.arange(
+            batch_size * self.beam_size, device=device
+        ).view(batch_size, self.beam_size)
+        self.beam_offset = self.beam_rows[:, 0]
 
         # initialize sequence scores variables.
-        sequence_scores = torch.empty(
-            batch_size * self.beam_size, device=device
+        sequence_scores = torch.full(
+            (batch_size * self.beam_size,), float("-inf"), device=device
         )
-        sequence_scores.fill_(float("-inf"))
 
         # keep only the first to make sure no redundancy.
         sequence_scores.index_fill_(0, self.beam_offset, 0.0)
 
-        # keep the hypothesis that reaches eos and their corresponding score and log_probs.
-        hyps_and_scores = [[] for _ in range(batch_size)]
-
-        # keep the sequences that still not reaches eos.
-        alived_seq = torch.empty(
-            batch_size * self.beam_size, 0, device=device
-        ).long()
+        min_decode_steps = int(enc_states.shape[1] * self.min_decode_ratio)
+        max_decode_steps = int(enc_states.shape[1] * self.max_decode_ratio)
 
-        # Keep the log-probabilities of alived sequences.
-        alived_log_probs = torch.empty(
-            batch_size * self.beam_size, 0, device=device
+        # keep the token, its log-probability and the previous beam chosen
+        # by each beam at each step. The sequences are recovered by
+        # following the parent pointers, so they are not copied every step.
+        alived_seq = torch.zeros(
+            batch_size * self.beam_size,
+            max_decode_steps,
+            dtype=torch.long,
+            device=device,
         )
+        alived_log_probs = torch.zeros(
+            batch_size * self.beam_size, max_decode_steps, device=device
+        )
+        parents = torch.zeros_like(alived_seq)
 
-        min_decode_steps = int(enc_states.shape[1] * self.min_decode_ratio)
-        max_decode_steps = int(enc_states.shape[1] * self.max_decode_ratio)
+        # keep the hypothesis that reaches eos and their corresponding score and log_probs.
+        finished = self._init_finished(batch_size, device)
 
         # Initialize the previous attention peak to zero
         # This variable will be used when using_max_attn_shift=True
@@ -620,7 +676,7 @@ class S2SBeamSearcher(S2SBaseSearcher):
 
         for t in range(max_decode_steps):
             # terminate condition
-            if self._check_full_beams(hyps_and_scores, self.beam_size):
+            if self._check_full_beams(finished, self.beam_size):
                 break
 
             log_probs, memory, attn = self.forward_step(
@@ -647,11 +703,7 @@ class S2SBeamSearcher(S2SBaseSearcher):
             # Set the eos prob to minus_inf when it doesn't exceed threshold.
             if self.using_eos_threshold:
                 cond = self._check_eos_threshold(log_probs)
-                log_probs[:, self.eos_index] = mask_by_condition(
-                    log_probs[:, self.eos_index],
-                    cond,
-                    fill_value=self.minus_inf,
-                )
+                log_probs[:, self.eos_index].masked_fill_(~cond, self.minus_inf)
 
             # adding LM scores to log_prob if lm_weight > 0
             if self.lm_weight > 0:
@@ -662,7 +714,8 @@ class S2SBeamSearcher(S2SBaseSearcher):
 
             # adding CTC scores to log_prob if ctc_weight > 0
             if self.ctc_weight > 0:
-                g = alived_seq
+                # only the length and last token of the prefixes are used
+                g = alived_seq[:, :t]
                 # block blank token
                 log_probs[:, self.blank_index] = self.minus_inf
                 if self.ctc_weight != 1.0 and self.ctc_score_mode == "partial":
@@ -678,17 +731,17 @@ class S2SBeamSearcher(S2SBaseSearcher):
                 )
                 log_probs = log_probs + self.ctc_weight * ctc_log_probs
 
-            scores = sequence_scores.unsqueeze(1).expand(-1, vocab_size)
-            scores = scores + log_probs
+            # [B, beam, 1] + [B, beam, V] -> [B, beam * V]
+            scores = sequence_scores.view(batch_size, self.beam_size, 1)
+            scores = scores + log_probs.view(batch_size, self.beam_size, -1)
+            scores = scores.view(batch_size, -1)
 
             # length normalization
             if self.length_normalization:
                 scores = scores / (t + 1)
 
             # keep topk beams
-            scores, candidates = scores.view(batch_size, -1).topk(
-                self.beam_size, dim=-1
-            )
+            scores, candidates = scores.topk(self.beam_size, dim=-1)
 
             # The input for the next step, also the output of current step.
             inp_tokens = (candidates % vocab_size).view(
@@ -704,8 +757,7 @@ class S2SBeamSearcher(S2SBaseSearcher):
 
             # The index of which beam the current top-K output came from in (t-1) timesteps.
             predecessors = (
-                candidates // vocab_size
-                + self.beam_offset.unsqueeze(1).expand_as(candidates)
+                candidates // vocab_size + self.beam_offset.unsqueeze(1)
             ).view(batch_size * self.beam_size)
 
             # Permute the memory to synchoronize with the output.
@@ -742,9 +794,7 @@ class S2SBeamSearcher(S2SBaseSearcher):
                     self.coverage = self.coverage + cur_attn
 
                 # Compute coverage penalty and add it to scores
-                penalty = torch.max(
-                    self.coverage, self.coverage.clone().fill_(0.5)
-                ).sum(-1)
+                penalty = self.coverage.clamp(min=0.5).sum(-1)
                 penalty = penalty - self.coverage.size(-1) * 0.5
                 penalty = penalty.view(batch_size * self.beam_size)
                 penalty = (
@@ -753,52 +803,33 @@ class S2SBeamSearcher(S2SBaseSearcher):
                 scores = scores - penalty * self.coverage_penalty
 
             # Update alived_seq
-            alived_seq = torch.cat(
-                [
-                    torch.index_select(alived_seq, dim=0, index=predecessors),
-                    inp_tokens.unsqueeze(1),
-                ],
-                dim=-1,
-            )
+            alived_seq[:, t] = inp_tokens
+            parents[:, t] = predecessors
 
             # Takes the log-probabilities
-            beam_log_probs = log_probs_clone[
-                torch.arange(batch_size).unsqueeze(1), candidates
-            ].reshape(batch_size * self.beam_size)
-            alived_log_probs = torch.cat(
-                [
-                    torch.index_select(
-                        alived_log_probs, dim=0, index=predecessors
-                    ),
-                    beam_log_probs.unsqueeze(1),
-                ],
-                dim=-1,
-            )
+            alived_log_probs[:, t] = torch.gather(
+                log_probs_clone, dim=1, index=candidates
+            ).view(-1)
 
             is_eos = self._update_hyp_and_scores(
-                inp_tokens,
-                alived_seq,
-                alived_log_probs,
-                hyps_and_scores,
-                scores,
-                timesteps=t,
+                inp_tokens, t + 1, finished, scores, timesteps=t,
             )
 
             # Block the paths that have reached eos.
             sequence_scores.masked_fill_(is_eos, float("-inf"))
 
-        if not self._check_full_beams(hyps_and_scores, self.beam_size):
+        if not self._check_full_beams(finished, self.beam_size):
             # Using all eos to fill-up the hyps.
-            eos = (
-                torch.zeros(batch_size * self.beam_size, device=device)
-                .fill_(self.eos_index)
-                .long()
+            eos = torch.full(
+                (batch_size * self.beam_size,),
+                self.eos_index,
+                dtype=torch.long,
+                device=device,
             )
             _ = self._update_hyp_and_scores(
                 eos,
-                alived_seq,
-                alived_log_probs,
-                hyps_and_scores,
+                max_decode_steps,
+                finished,
                 scores,
                 timesteps=max_decode_steps,
             )
@@ -808,7 +839,9 @@ class S2SBeamSearcher(S2SBaseSearcher):
             topk_scores,
             topk_lengths,
             log_probs,
-        ) = self._get_top_score_prediction(hyps_and_scores, topk=self.topk,)
+        ) = self._get_top_score_prediction(
+            finished, alived_seq, alived_log_probs, parents, topk=self.topk,
+        )
         # pick the best hyp
         predictions = topk_hyps[:, 0, :]
         predictions = batch_filter_seq2seq_output(
@@ -878,6 +911,12 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
     temperature : float
         Temperature factor applied to softmax. It changes the probability
         distribution, being softer when T>1 and sharper with T<1.
+    autocast_dtype : str
+        If given (e.g. "bfloat16" or "float16"), the output layer is computed
+        in this precision through torch.autocast. The log-probabilities and
+        the beam scores are still computed in float32. float16 is only
+        used on CUDA, the output layer runs in float32 otherwise.
+        (default: None)
     **kwargs
         see S2SBeamSearcher, arguments are directly passed.
 
@@ -906,6 +945,10 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
     >>> hyps, scores = searcher(enc, wav_len)
     """
 
+    # The attention modules of AttentionalRNNDecoder handle beam_size
+    # queries per sentence, so enc_states need not be repeated
+    inflate_enc_states = False
+
     def __init__(
         self,
         embedding,
@@ -913,6 +956,7 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
         linear,
         ctc_linear=None,
         temperature=1.0,
+        autocast_dtype=None,
         **kwargs,
     ):
         super(S2SRNNBeamSearcher, self).__init__(**kwargs)
@@ -927,6 +971,17 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
 
         self.softmax = torch.nn.LogSoftmax(dim=-1)
         self.temperature = temperature
+        if autocast_dtype not in (None, "float16", "bfloat16"):
+            raise ValueError(
+                "autocast_dtype must be None, 'float16' or 'bfloat16', "
+                f"got {autocast_dtype}"
+            )
+        self.autocast_dtype = autocast_dtype
+
+        # The layout of the decoder memory is fixed by the decoder type,
+        # so that permute_mem does not have to inspect it at every step
+        self._lstm_memory = self.dec.rnn_type == "lstm"
+        self._location_attn = self.dec.attn_type == "location"
 
     def reset_mem(self, batch_size, device):
         hs = None
@@ -941,7 +996,19 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
             dec_out, hs, c, w = self.dec.forward_step(
                 e, hs, c, enc_states, enc_lens
             )
-            log_probs = self.softmax(self.fc(dec_out) / self.temperature)
+            # CPU autocast only supports bfloat16, float16 runs in float32
+            if self.autocast_dtype is None or (
+                self.autocast_dtype == "float16" and not dec_out.is_cuda
+            ):
+                logits = self.fc(dec_out)
+            else:
+                with torch.autocast(
+                    device_type=dec_out.device.type,
+                    dtype=getattr(torch, self.autocast_dtype),
+                ):
+                    logits = self.fc(dec_out)
+            # scores are accumulated in float32
+            log_probs = self.softmax(logits.float() / self.temperature)
         # average attn weight of heads when attn_type is multiheadlocation
         if self.dec.attn_type == "multiheadlocation":
             w = torch.mean(w, dim=1)
@@ -951,7 +1018,7 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
         hs, c = memory
 
         # shape of hs: [num_layers, batch_size, n_neurons]
-        if isinstance(hs, tuple):
+        if self._lstm_memory:
             hs_0 = torch.index_select(hs[0], dim=1, index=index)
             hs_1 = torch.index_select(hs[1], dim=1, index=index)
             hs = (hs_0, hs_1)
@@ -959,7 +1026,7 @@ class S2SRNNBeamSearcher(S2SBeamSearcher):
             hs = torch.index_select(hs, dim=1, index=index)
 
         c = torch.index_select(c, dim=0, index=index)
-        if self.dec.attn_type == "location":
+        if self._location_attn:
             self.dec.attn.prev_attn = torch.index_select(
                 self.dec.attn.prev_attn, dim=0, index=index
             )
@@ -1200,10 +1267,7 @@ def mask_by_condition(tensor, cond, fill_value):
     tensor([[1., 2., 0.],
             [4., 0., 0.]])
     """
-    tensor = torch.where(
-        cond, tensor, torch.Tensor([fill_value]).to(tensor.device)
-    )
-    return tensor
+    return tensor.masked_fill(~cond, fill_value)
 
 
 def _update_mem(inp_tokens, memory):
@@ -1234,6 +1298,12 @@ class S2STransformerBeamSearch(S2SBeamSearcher):
         The model to use for decoding.
     linear : torch.nn.Module
         A linear output layer.
+    use_kv_cache : bool
+        If True (default), the decoder self-attention keys and values of the
+        previous tokens are kept in the memory, so that each step only runs
+        the decoder on the last token. The model's decode method must then
+        support past_kvs and use_cache, as TransformerASR does. The attention
+        returned at each step then only covers the last token.
     **kwargs
         Arguments to pass to S2SBeamSearcher
 
@@ -1243,7 +1313,12 @@ class S2STransformerBeamSearch(S2SBeamSearcher):
     """
 
     def __init__(
-        self, modules, temperature=1.0, temperature_lm=1.0, **kwargs,
+        self,
+        modules,
+        temperature=1.0,
+        temperature_lm=1.0,
+        use_kv_cache=True,
+        **kwargs,
     ):
         super(S2STransformerBeamSearch, self).__init__(**kwargs)
 
@@ -1254,6 +1329,7 @@ class S2STransformerBeamSearch(S2SBeamSearcher):
 
         self.temperature = temperature
         self.temperature_lm = temperature_lm
+        self.use_kv_cache = use_kv_cache
 
     def reset_mem(self, batch_size, device):
         return None
@@ -1262,6 +1338,11 @@ class S2STransformerBeamSearch(S2SBeamSearcher):
         return None
 
     def permute_mem(self, memory, index):
+        if self.use_kv_cache:
+            return [
+                (k.index_select(0, index), v.index_select(0, index))
+                for k, v in memory
+            ]
         memory = torch.index_select(memory, dim=0, index=index)
         return memory
 
@@ -1270,8 +1351,16 @@ class S2STransformerBeamSearch(S2SBeamSearcher):
         return memory
 
     def forward_step(self, inp_tokens, memory, enc_states, enc_lens):
-        memory = _update_mem(inp_tokens, memory)
-        pred, attn = self.model.decode(memory, enc_states)
+        if self.use_kv_cache:
+            pred, attn, memory = self.model.decode(
+                inp_tokens.unsqueeze(1),
+                enc_states,
+                past_kvs=memory,
+                use_cache=True,
+            )
+        else:
+            memory = _update_mem(inp_tokens, memory)
+            pred, attn = self.model.decode(memory, enc_states)
         prob_dist = self.softmax(self.fc(pred) / self.temperature)
         return prob_dist[:, -1, :], memory, attn
 
@@ -1291,6 +1380,8 @@ def batch_filter_seq2seq_output(prediction, eos_id=-1):
     ---------
     prediction : list of torch.Tensor
         A list containing the output ints predicted by the seq2seq system.
+        The tensors are padded into a (batch, time) tensor, which is
+        filtered in one pass. Such a 2-D tensor can also be given directly.
     eos_id : int, string
         The id of the eos.
 
@@ -1305,7 +1396,37 @@ def batch_filter_seq2seq_output(prediction, eos_id=-1):
     >>> predictions = batch_filter_seq2seq_output(predictions, eos_id=4)
     >>> predictions
     [[1, 2, 3], [2, 3]]
+    >>> predictions = torch.IntTensor([[1,2,3,4], [2,3,1,5]])
+    >>> batch_filter_seq2seq_output(predictions, eos_id=4)
+    [[1, 2, 3], [2, 3, 1, 5]]
     """
+    if (
+        isinstance(prediction, list)
+        and len(prediction) > 0
+        and all(
+            isinstance(p, torch.Tensor) and p.dim() == 1 for p in prediction
+        )
+    ):
+        # Padding with eos, the padding is filtered out with the rest
+        prediction = torch.nn.utils.rnn.pad_sequence(
+            prediction, batch_first=True, padding_value=eos_id
+        )
+
+    if isinstance(prediction, torch.Tensor) and prediction.dim() == 2:
+        # Position of the first eos of each row, or the row length if none
+        is_eos = prediction.eq(eos_id)
+        lengths = torch.where(
+            is_eos.any(dim=1),
+            is_eos.int().argmax(dim=1),
+            torch.full_like(
+                is_eos[:, 0], prediction.shape[1], dtype=torch.long
+            ),
+        )
+        return [
+            p[:length]
+            for p, length in zip(prediction.tolist(), lengths.tolist())
+        ]
+
     outputs = []
     for p in prediction:
         res = filter_seq2seq_output(p.tolist(), eos_id=eos_id)
@@ -1337,10 +1458,8 @@ def filter_seq2seq_output(string_pred, eos_id=-1):
     """
     if isinstance(string_pred, list):
         try:
-            eos_index = next(
-                i for i, v in enumerate(string_pred) if v == eos_id
-            )
-        except StopIteration:
+            eos_index = string_pred.index(eos_id)
+        except ValueError:
             eos_index = len(string_pred)
         string_out = string_pred[:eos_index]
     else:
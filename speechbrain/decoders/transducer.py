@@ -40,6 +40,11 @@ class TransducerBeamSearcher(torch.nn.Module):
         that are added in A (process_hyp).
         Reference: https://arxiv.org/pdf/1911.01629.pdf
         Reference: https://github.com/kaldi-asr/kaldi/blob/master/src/decoder/simple-decoder.cc (See PruneToks)
+    use_cuda_graph : bool
+        If True and the input is on a CUDA device, the joint and classifier
+        step of the greedy search is captured once in a CUDA graph and
+        replayed at every time step, removing the kernel launch overhead
+        of this small, fixed-shape step. (default: False)
 
     Example
     -------
@@ -95,6 +100,7 @@ class TransducerBeamSearcher(torch.nn.Module):
         lm_weight=0.0,
         state_beam=2.3,
         expand_beam=2.3,
+        use_cuda_graph=False,
     ):
         super(TransducerBeamSearcher, self).__init__()
         self.decode_network_lst = decode_network_lst
@@ -112,6 +118,9 @@ class TransducerBeamSearcher(torch.nn.Module):
         self.state_beam = state_beam
         self.expand_beam = expand_beam
         self.softmax = torch.nn.LogSoftmax(dim=-1)
+        self.use_cuda_graph = use_cuda_graph
+        self._joint_graph = None
+        self._joint_graph_key = None
 
         if self.beam_size <= 1:
             self.searcher = self.transducer_greedy_decode
@@ -154,26 +163,31 @@ class TransducerBeamSearcher(torch.nn.Module):
             Outputs a logits tensor [B,T,1,Output_Dim]; padding
             has not been removed.
         """
-        hyp = {
-            "prediction": [[] for _ in range(tn_output.size(0))],
-            "logp_scores": [0.0 for _ in range(tn_output.size(0))],
-        }
+        batch_size = tn_output.size(0)
+        # Emitted labels, emission masks and scores are kept on device
+        # for the whole batch, and only transferred once at the end.
+        predictions = []
+        emitted = []
+        logp_scores = torch.zeros(batch_size, device=tn_output.device)
         # prepare BOS = Blank for the Prediction Network (PN)
         hidden = None
         input_PN = (
             torch.ones(
-                (tn_output.size(0), 1),
-                device=tn_output.device,
-                dtype=torch.int32,
+                (batch_size, 1), device=tn_output.device, dtype=torch.int32,
             )
             * self.blank_id
         )
+        # The joint step has a fixed shape, it can be replayed from a graph
+        if self.use_cuda_graph and tn_output.is_cuda:
+            joint_forward_step = self._graphed_joint_forward_step
+        else:
+            joint_forward_step = self._joint_forward_step
         # First forward-pass on PN
         out_PN, hidden = self._forward_PN(input_PN, self.decode_network_lst)
         # For each time step
         for t_step in range(tn_output.size(1)):
             # do unsqueeze over since tjoint must be have a 4 dim [B,T,U,Hidden]
-            log_probs = self._joint_forward_step(
+            log_probs = joint_forward_step(
                 tn_output[:, t_step, :].unsqueeze(1).unsqueeze(1),
                 out_PN.unsqueeze(1),
             )
@@ -181,17 +195,17 @@ class TransducerBeamSearcher(torch.nn.Module):
             logp_targets, positions = torch.max(
                 self.softmax(log_probs).squeeze(1).squeeze(1), dim=1
             )
-            # Batch hidden update
-            have_update_hyp = []
-            for i in range(positions.size(0)):
-                # Update hiddens only if
-                # 1- current prediction is non blank
-                if positions[i].item() != self.blank_id:
-                    hyp["prediction"][i].append(positions[i].item())
-                    hyp["logp_scores"][i] += logp_targets[i]
-                    input_PN[i][0] = positions[i]
-                    have_update_hyp.append(i)
-            if len(have_update_hyp) > 0:
+            # Update hiddens only if
+            # 1- current prediction is non blank
+            have_update_hyp = positions.ne(self.blank_id)
+            predictions.append(positions)
+            emitted.append(have_update_hyp)
+            logp_scores += logp_targets.masked_fill(~have_update_hyp, 0.0)
+            (have_update_hyp,) = torch.nonzero(have_update_hyp, as_tuple=True)
+            if have_update_hyp.size(0) > 0:
+                input_PN[have_update_hyp, 0] = positions[have_update_hyp].to(
+                    input_PN.dtype
+                )
                 # Select sentence to update
                 # And do a forward steps + generated hidden
                 (
@@ -209,9 +223,18 @@ class TransducerBeamSearcher(torch.nn.Module):
                     have_update_hyp, selected_hidden, hidden
                 )
 
+        if len(predictions) > 0:
+            predictions = torch.stack(predictions, dim=1).cpu()
+            emitted = torch.stack(emitted, dim=1).cpu()
+            hyps = [
+                pred[mask].tolist() for pred, mask in zip(predictions, emitted)
+            ]
+        else:
+            hyps = [[] for _ in range(batch_size)]
+
         return (
-            hyp["prediction"],
-            torch.Tensor(hyp["logp_scores"]).exp().mean(),
+            hyps,
+            logp_scores.cpu().exp().mean(),
             None,
             None,
         )
@@ -264,6 +287,9 @@ class TransducerBeamSearcher(torch.nn.Module):
                 lm_dict = {"hidden_lm": None}
                 hyp.update(lm_dict)
             beam_hyps = [hyp]
+            # PN outputs only depend on the label prefix, cache them
+            # to avoid re-running the PN on already expanded prefixes.
+            pn_cache = {}
 
             # For each time step
             for t_step in range(tn_output.size(1)):
@@ -296,10 +322,11 @@ class TransducerBeamSearcher(torch.nn.Module):
 
                     # forward PN
                     input_PN[0, 0] = a_best_hyp["prediction"][-1]
-                    out_PN, hidden = self._forward_PN(
+                    out_PN, hidden = self._forward_PN_cached(
                         input_PN,
-                        self.decode_network_lst,
+                        a_best_hyp["prediction"],
                         a_best_hyp["hidden_dec"],
+                        pn_cache,
                     )
                     # do unsqueeze over since tjoint must be have a 4 dim [B,T,U,Hidden]
                     log_probs = self._joint_forward_step(
@@ -387,6 +414,43 @@ class TransducerBeamSearcher(torch.nn.Module):
             log_probs = self.softmax(out)
         return log_probs
 
+    def _graphed_joint_forward_step(self, h_i, out_PN):
+        """Join predictions (TN & PN) by replaying a captured CUDA graph.
+
+        The graph is (re)captured whenever the shapes, dtype or device
+        of the inputs change, e.g. for the last batch of a dataset.
+        """
+        key = (h_i.shape, out_PN.shape, h_i.dtype, h_i.device)
+        if self._joint_graph_key != key:
+            static_h_i = h_i.clone()
+            static_out_PN = out_PN.clone()
+            # Warm up on a side stream before capturing, as required by
+            # the CUDA graph API (e.g. for lazy cuBLAS initialization).
+            stream = torch.cuda.Stream(device=h_i.device)
+            stream.wait_stream(torch.cuda.current_stream(h_i.device))
+            with torch.cuda.stream(stream):
+                for _ in range(3):
+                    self._joint_forward_step(static_h_i, static_out_PN)
+            torch.cuda.current_stream(h_i.device).wait_stream(stream)
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph):
+                static_log_probs = self._joint_forward_step(
+                    static_h_i, static_out_PN
+                )
+            self._joint_graph = (
+                graph,
+                static_h_i,
+                static_out_PN,
+                static_log_probs,
+            )
+            self._joint_graph_key = key
+
+        graph, static_h_i, static_out_PN, static_log_probs = self._joint_graph
+        static_h_i.copy_(h_i)
+        static_out_PN.copy_(out_PN)
+        graph.replay()
+        return static_log_probs.clone()
+
     def _lm_forward_step(self, inp_tokens, memory):
         """This method should implement one step of
         forwarding operation for language model.
@@ -505,6 +569,36 @@ class TransducerBeamSearcher(torch.nn.Module):
                 out_PN = layer(out_PN)
         return out_PN, hidden
 
+    def _forward_PN_cached(self, input_PN, prediction, hidden, cache):
+        """Compute the PN forward-pass for a label prefix, reusing the result
+        when the same prefix has already been expanded.
+
+        Arguments
+        ----------
+        input_PN : torch.tensor
+            Last label of the prefix with shape [1, 1].
+        prediction : list
+            The label prefix (including the initial blank) of the hypothesis.
+        hidden : torch.tensor
+            Hidden tensor of the prefix without its last label.
+        cache : dict
+            Mapping from label prefixes to (out_PN, hidden) results.
+
+        Returns
+        -------
+        out_PN : torch.tensor
+            Outputs a logits tensor [1, 1, hiddens].
+        hidden : torch.tensor
+            Hidden tensor to be used for the next step
+            by recurrent layers in prediction network.
+        """
+        key = tuple(prediction)
+        if key not in cache:
+            cache[key] = self._forward_PN(
+                input_PN, self.decode_network_lst, hidden
+            )
+        return cache[key]
+
     def _forward_after_joint(self, out, classifier_network):
         """Compute forward-pass through a list of classifier neural network.
 
@@ -5,12 +5,14 @@ Authors
 """
 import math
 import torch
+import contextlib
 import torch.nn as nn
 import speechbrain as sb
 from typing import Optional
 
 from .conformer import ConformerEncoder
 from speechbrain.nnet.activations import Swish
+from speechbrain.nnet.attention import _is_compiling, _version
 
 
 class TransformerInterface(nn.Module):
@@ -149,26 +151,55 @@ class PositionalEncoding(nn.Module):
     def __init__(self, input_size, max_len=2500):
         super().__init__()
         self.max_len = max_len
-        pe = torch.zeros(self.max_len, input_size, requires_grad=False)
         positions = torch.arange(0, self.max_len).unsqueeze(1).float()
         denominator = torch.exp(
             torch.arange(0, input_size, 2).float()
             * -(math.log(10000.0) / input_size)
         )
 
-        pe[:, 0::2] = torch.sin(positions * denominator)
-        pe[:, 1::2] = torch.cos(positions * denominator)
-        pe = pe.unsqueeze(0)
+        # Interleave sin and cos along the feature dimension in one go
+        angles = positions * denominator
+        pe = torch.stack((angles.sin(), angles.cos()), dim=-1)
+        pe = pe.reshape(1, self.max_len, input_size)
         self.register_buffer("pe", pe)
 
-    def forward(self, x):
+        # Copies of the table cast to the dtypes of the inputs (e.g. under
+        # mixed precision), so that it is not cast again at every call
+        self._pe_cache = {}
+
+    def forward(self, x, offset: int = 0):
         """
         Arguments
         ---------
         x : tensor
             Input feature shape (batch, time, fea)
+        offset : int
+            Position of the first frame of x (default 0).
         """
-        return self.pe[:, : x.size(1)].clone().detach()
+        pe = self.pe
+        if x.is_floating_point() and x.dtype != pe.dtype:
+            if torch.jit.is_scripting():
+                pe = pe.to(x.dtype)
+            else:
+                pe = self._cast_pe(x.dtype)
+
+        # The table does not require grad and is never modified in place,
+        # so a view of it can be returned without copying
+        return pe[:, offset : offset + x.size(1)]
+
+    @torch.jit.unused
+    def _cast_pe(self, dtype: torch.dtype):
+        """Returns the table cast to dtype, cached until the buffer is moved
+        or overwritten (e.g. by loading a checkpoint).
+        """
+        key = (self.pe.device, _version(self.pe))
+        cached = self._pe_cache.get(dtype)
+        if cached is None or cached[0] != key:
+            # A copy made under inference_mode could not be used by autograd
+            with _outside_inference_mode():
+                cached = (key, self.pe.to(dtype))
+            self._pe_cache[dtype] = cached
+        return cached[1]
 
 
 class TransformerEncoderLayer(nn.Module):
@@ -252,12 +283,15 @@ class TransformerEncoderLayer(nn.Module):
         else:
             src1 = src
 
+        # The self-attention weights are not needed, which lets torch use the
+        # fused scaled_dot_product_attention kernels (self_attn is None)
         output, self_attn = self.self_att(
             src1,
             src1,
             src1,
             attn_mask=src_mask,
             key_padding_mask=src_key_padding_mask,
+            return_attn_weights=False,
         )
 
         # add & norm
@@ -456,6 +490,10 @@ class TransformerDecoderLayer(nn.Module):
         memory_mask=None,
         tgt_key_padding_mask=None,
         memory_key_padding_mask=None,
+        tgt_is_causal=False,
+        past_kv=None,
+        use_cache=False,
+        return_attention=True,
     ):
         """
         Arguments
@@ -472,20 +510,64 @@ class TransformerDecoderLayer(nn.Module):
             The mask for the tgt keys per batch (optional).
         memory_key_padding_mask: tensor
             The mask for the memory keys per batch (optional).
+        tgt_is_causal: bool
+            Whether tgt_mask is the lookahead mask (optional).
+        past_kv: tuple
+            Keys and values of the self-attention for the previous positions,
+            as returned with use_cache=True. tgt then only holds the new
+            positions, which attend causally to the previous ones. tgt_mask
+            and tgt_key_padding_mask are not used (optional).
+        use_cache: bool
+            If True, the keys and values of the self-attention for all the
+            positions are returned as a fourth output. Meant for inference,
+            as in autoregressive decoding (optional).
+        return_attention: bool
+            Whether to compute the weights of the attention over memory. If
+            False, multihead_attention is None and the fused attention
+            kernels are used (optional).
         """
         if self.normalize_before:
             tgt1 = self.norm1(tgt)
         else:
             tgt1 = tgt
 
-        # self-attention over the target sequence
-        tgt2, self_attn = self.self_attn(
-            query=tgt1,
-            key=tgt1,
-            value=tgt1,
-            attn_mask=tgt_mask,
-            key_padding_mask=tgt_key_padding_mask,
-        )
+        if use_cache:
+            # only project the new positions, after the cached ones
+            keys, values = self.self_attn.project_kv(tgt1)
+            if past_kv is not None:
+                keys = torch.cat((past_kv[0], keys), dim=2)
+                values = torch.cat((past_kv[1], values), dim=2)
+            past_kv = (keys, values)
+
+            attn_mask = None
+            if tgt1.shape[1] > 1:
+                attn_mask = torch.triu(
+                    torch.full(
+                        (tgt1.shape[1], keys.shape[2]),
+                        float("-inf"),
+                        device=tgt1.device,
+                    ),
+                    diagonal=keys.shape[2] - tgt1.shape[1] + 1,
+                )
+            tgt2, self_attn = self.self_attn.attend(
+                tgt1,
+                keys,
+                values,
+                attn_mask=attn_mask,
+                return_attn_weights=False,
+            )
+        else:
+            # self-attention over the target sequence, through the fused
+            # kernels as its weights are not needed (self_attn is None)
+            tgt2, self_attn = self.self_attn(
+                query=tgt1,
+                key=tgt1,
+                value=tgt1,
+                attn_mask=tgt_mask,
+                key_padding_mask=tgt_key_padding_mask,
+                return_attn_weights=False,
+                is_causal=tgt_is_causal,
+            )
 
         # add & norm
         tgt = tgt + self.dropout1(tgt2)
@@ -504,6 +586,7 @@ class TransformerDecoderLayer(nn.Module):
             value=memory,
             attn_mask=memory_mask,
             key_padding_mask=memory_key_padding_mask,
+            return_attn_weights=return_attention,
         )
 
         # add & norm
@@ -523,6 +606,8 @@ class TransformerDecoderLayer(nn.Module):
         if not self.normalize_before:
             tgt = self.norm3(tgt)
 
+        if use_cache:
+            return tgt, self_attn, multihead_attention, past_kv
         return tgt, self_attn, multihead_attention
 
 
@@ -592,6 +677,10 @@ class TransformerDecoder(nn.Module):
         memory_mask=None,
         tgt_key_padding_mask=None,
         memory_key_padding_mask=None,
+        tgt_is_causal=False,
+        past_kvs=None,
+        use_cache=False,
+        return_attention=True,
     ):
         """
         Arguments
@@ -608,22 +697,45 @@ class TransformerDecoder(nn.Module):
             The mask for the tgt keys per batch (optional).
         memory_key_padding_mask : tensor
             The mask for the memory keys per batch (optional).
+        tgt_is_causal : bool
+            Whether tgt_mask is the lookahead mask (optional).
+        past_kvs : list of tuples
+            Self-attention keys and values of each layer for the previous
+            positions, as returned with use_cache=True (optional).
+            See TransformerDecoderLayer.
+        use_cache : bool
+            If True, the self-attention keys and values of each layer are
+            returned as a fourth output (optional).
+        return_attention : bool
+            Whether to compute the weights of the attention over memory of
+            each layer. If False, the returned attention lists are empty
+            (optional).
         """
         output = tgt
-        self_attns, multihead_attns = [], []
-        for dec_layer in self.layers:
-            output, self_attn, multihead_attn = dec_layer(
+        self_attns, multihead_attns, present_kvs = [], [], []
+        for i, dec_layer in enumerate(self.layers):
+            outputs = dec_layer(
                 output,
                 memory,
                 tgt_mask=tgt_mask,
                 memory_mask=memory_mask,
                 tgt_key_padding_mask=tgt_key_padding_mask,
                 memory_key_padding_mask=memory_key_padding_mask,
+                tgt_is_causal=tgt_is_causal,
+                past_kv=None if past_kvs is None else past_kvs[i],
+                use_cache=use_cache,
+                return_attention=return_attention,
             )
-            self_attns.append(self_attn)
-            multihead_attns.append(multihead_attn)
+            output, self_attn, multihead_attn = outputs[:3]
+            if return_attention:
+                self_attns.append(self_attn)
+                multihead_attns.append(multihead_attn)
+            if use_cache:
+                present_kvs.append(outputs[3])
         output = self.norm(output)
 
+        if use_cache:
+            return output, self_attns, multihead_attns, present_kvs
         return output, self_attns, multihead_attns
 
 
@@ -677,17 +789,12 @@ def get_key_padding_mask(padded_input, pad_idx):
             [False, False,  True],
             [False, False,  True]])
     """
-    if len(padded_input.shape) == 4:
-        bz, time, ch1, ch2 = padded_input.shape
-        padded_input = padded_input.reshape(bz, time, ch1 * ch2)
-
-    key_padded_mask = padded_input.eq(pad_idx).to(padded_input.device)
+    key_padded_mask = padded_input.eq(pad_idx)
 
     # if the input is more than 2d, mask the locations where they are silence
     # across all channels
     if len(padded_input.shape) > 2:
-        key_padded_mask = key_padded_mask.float().prod(dim=-1).bool()
-        return key_padded_mask.detach()
+        key_padded_mask = key_padded_mask.flatten(start_dim=2).all(dim=-1)
 
     return key_padded_mask.detach()
 
@@ -709,13 +816,40 @@ def get_lookahead_mask(padded_input):
             [0., 0., 0.]])
     """
     seq_len = padded_input.shape[1]
-    mask = (
-        torch.triu(torch.ones((seq_len, seq_len), device=padded_input.device))
-        == 1
-    ).transpose(0, 1)
-    mask = (
-        mask.float()
-        .masked_fill(mask == 0, float("-inf"))
-        .masked_fill(mask == 1, float(0.0))
+    device = padded_input.device
+    if _is_compiling():
+        # The cache cannot be traced, and the compiled graph builds the
+        # mask cheaply anyway
+        return _lookahead_mask(seq_len, device)
+
+    # The masks of shorter sequences are the top-left corners of the
+    # largest one, so a single mask is kept per device
+    mask = _lookahead_masks.get(device)
+    if mask is None or mask.shape[0] < seq_len:
+        # A mask built under inference_mode could not be used by autograd
+        with _outside_inference_mode():
+            mask = _lookahead_mask(seq_len, device)
+        _lookahead_masks[device] = mask
+    return mask[:seq_len, :seq_len]
+
+
+# The largest lookahead mask built so far, per device. The returned masks
+# are views of it and must not be modified in place.
+_lookahead_masks = {}
+
+
+def _lookahead_mask(seq_len, device):
+    """Builds the (seq_len, seq_len) lookahead mask."""
+    return torch.triu(
+        torch.full((seq_len, seq_len), float("-inf"), device=device),
+        diagonal=1,
     )
-    return mask.detach().to(padded_input.device)
+
+
+def _outside_inference_mode():
+    """Returns a context disabling torch.inference_mode (torch >= 1.9), so
+    that the cached tensors created in it can also be used by autograd.
+    """
+    if hasattr(torch, "inference_mode"):
+        return torch.inference_mode(False)
+    return contextlib.nullcontext()
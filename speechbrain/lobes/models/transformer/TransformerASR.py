@@ -151,6 +151,8 @@ class TransformerASR(TransformerInterface):
             memory=encoder_out,
             tgt_mask=tgt_mask,
             tgt_key_padding_mask=tgt_key_padding_mask,
+            tgt_is_causal=True,
+            return_attention=False,
         )
 
         return encoder_out, decoder_out
@@ -177,7 +179,7 @@ class TransformerASR(TransformerInterface):
         tgt_mask = get_lookahead_mask(tgt)
         return src_key_padding_mask, tgt_key_padding_mask, src_mask, tgt_mask
 
-    def decode(self, tgt, encoder_out):
+    def decode(self, tgt, encoder_out, past_kvs=None, use_cache=False):
         """This method implements a decoding step for the transformer model.
 
         Arguments
@@ -186,12 +188,44 @@ class TransformerASR(TransformerInterface):
             The sequence to the decoder (required).
         encoder_out : tensor
             Hidden output of the encoder (required).
+        past_kvs : list of tuples
+            Decoder self-attention keys and values for the previous tokens,
+            as returned by a previous call with use_cache=True. tgt then
+            only holds the new tokens (optional).
+        use_cache : bool
+            If True, the decoder self-attention keys and values of all the
+            tokens are returned as a third output, to be passed as past_kvs
+            for the next step (optional).
+
+        Example
+        -------
+        >>> net = TransformerASR(10, 16, 16, 2, 1, 2, 32).eval()
+        >>> enc_out = torch.rand(2, 7, 16)
+        >>> tgt = torch.randint(0, 10, [2, 4])
+        >>> pred, attn = net.decode(tgt, enc_out)
+        >>> pred_last, attn_last, past_kvs = net.decode(
+        ...     tgt[:, :3], enc_out, use_cache=True
+        ... )
+        >>> pred_last, attn_last, past_kvs = net.decode(
+        ...     tgt[:, 3:], enc_out, past_kvs=past_kvs, use_cache=True
+        ... )
+        >>> torch.allclose(pred[:, -1:], pred_last, atol=1e-5)
+        True
         """
+        if use_cache:
+            offset = 0 if past_kvs is None else past_kvs[0][0].shape[2]
+            tgt = self.custom_tgt_module(tgt)
+            tgt = tgt + self.positional_encoding(tgt, offset)
+            prediction, _, multihead_attns, past_kvs = self.decoder(
+                tgt, encoder_out, past_kvs=past_kvs, use_cache=True
+            )
+            return prediction, multihead_attns[-1], past_kvs
+
         tgt_mask = get_lookahead_mask(tgt)
         tgt = self.custom_tgt_module(tgt)
         tgt = tgt + self.positional_encoding(tgt)
         prediction, self_attns, multihead_attns = self.decoder(
-            tgt, encoder_out, tgt_mask=tgt_mask
+            tgt, encoder_out, tgt_mask=tgt_mask, tgt_is_causal=True
         )
         return prediction, multihead_attns[-1]
 
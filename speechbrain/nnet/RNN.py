@@ -9,6 +9,7 @@ Authors
 
 import torch
 import logging
+import numpy as np
 import torch.nn as nn
 from speechbrain.nnet.attention import (
     ContentBasedAttention,
@@ -16,9 +17,10 @@ from speechbrain.nnet.attention import (
     KeyValueAttention,
 )
 from torch import Tensor
-from typing import Optional
+from typing import Optional, Tuple
 
 logger = logging.getLogger(__name__)
+_HALF_DTYPES = (torch.float16, torch.bfloat16)
 
 
 def pack_padded_sequence(inputs, lengths):
@@ -51,6 +53,45 @@ def pad_packed_sequence(inputs):
     return outputs
 
 
+def cell_forward(cell, x, hx):
+    """Returns the output of a torch.nn cell for one timestep.
+
+    The fused cell kernel is called directly, which skips the nn.Module
+    call overhead that dominates small cells in autoregressive loops.
+    Cells with hooks, or of another type (e.g. dynamically quantized
+    cells), are called as modules.
+
+    Arguments
+    ---------
+    cell : torch.nn.Module
+        A torch.nn.RNNCell, torch.nn.GRUCell or torch.nn.LSTMCell.
+    x : torch.Tensor
+        The input of the cell, formatted as (batch, fea).
+    hx : torch.Tensor or tuple
+        The hidden state of the cell (a tuple (h, c) for LSTMCell).
+
+    Example
+    -------
+    >>> cell = torch.nn.GRUCell(20, 5)
+    >>> inp_tensor = torch.rand([4, 20])
+    >>> hx = torch.zeros([4, 5])
+    >>> torch.allclose(cell_forward(cell, inp_tensor, hx), cell(inp_tensor, hx))
+    True
+    """
+    if cell._forward_hooks or cell._forward_pre_hooks:
+        return cell(x, hx)
+    weights = (cell.weight_ih, cell.weight_hh, cell.bias_ih, cell.bias_hh)
+    if type(cell) is nn.LSTMCell:
+        return torch._VF.lstm_cell(x, hx, *weights)
+    if type(cell) is nn.GRUCell:
+        return torch._VF.gru_cell(x, hx, *weights)
+    if type(cell) is nn.RNNCell and cell.nonlinearity == "tanh":
+        return torch._VF.rnn_tanh_cell(x, hx, *weights)
+    if type(cell) is nn.RNNCell and cell.nonlinearity == "relu":
+        return torch._VF.rnn_relu_cell(x, hx, *weights)
+    return cell(x, hx)
+
+
 class RNN(torch.nn.Module):
     """This function implements a vanilla RNN.
 
@@ -113,7 +154,7 @@ class RNN(torch.nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[2:]))
+            input_size = int(np.prod(input_shape[2:]))
 
         self.rnn = torch.nn.RNN(
             input_size=input_size,
@@ -146,8 +187,16 @@ class RNN(torch.nn.Module):
             if x.ndim == 4:
                 x = x.reshape(x.shape[0], x.shape[1], x.shape[2] * x.shape[3])
 
-        # Flatten params for data parallel
-        self.rnn.flatten_parameters()
+        # Follow the precision of half precision weights, e.g. of a module
+        # cast with .to(torch.bfloat16) for inference (without autocast)
+        weight = getattr(self.rnn, "weight_ih_l0", None)
+        if weight is not None and weight.dtype in _HALF_DTYPES:
+            x = x.to(weight.dtype)
+
+        # Flatten params for data parallel replicas. Other modules are
+        # flattened by torch whenever they are moved (e.g. with .to())
+        if getattr(self.rnn, "_is_replica", False):
+            self.rnn.flatten_parameters()
 
         # Pack sequence for proper RNN handling of padding
         if lengths is not None:
@@ -225,7 +274,7 @@ class LSTM(torch.nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[2:])).item()
+            input_size = int(np.prod(input_shape[2:]))
 
         self.rnn = torch.nn.LSTM(
             input_size=input_size,
@@ -257,8 +306,16 @@ class LSTM(torch.nn.Module):
             if x.ndim == 4:
                 x = x.reshape(x.shape[0], x.shape[1], x.shape[2] * x.shape[3])
 
-        # Flatten params for data parallel
-        self.rnn.flatten_parameters()
+        # Follow the precision of half precision weights, e.g. of a module
+        # cast with .to(torch.bfloat16) for inference (without autocast)
+        weight = getattr(self.rnn, "weight_ih_l0", None)
+        if weight is not None and weight.dtype in _HALF_DTYPES:
+            x = x.to(weight.dtype)
+
+        # Flatten params for data parallel replicas. Other modules are
+        # flattened by torch whenever they are moved (e.g. with .to())
+        if getattr(self.rnn, "_is_replica", False):
+            self.rnn.flatten_parameters()
 
         # Pack sequence for proper RNN handling of padding
         if lengths is not None:
@@ -336,7 +393,7 @@ class GRU(torch.nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[2:]))
+            input_size = int(np.prod(input_shape[2:]))
 
         self.rnn = torch.nn.GRU(
             input_size=input_size,
@@ -368,8 +425,16 @@ class GRU(torch.nn.Module):
             if x.ndim == 4:
                 x = x.reshape(x.shape[0], x.shape[1], x.shape[2] * x.shape[3])
 
-        # Flatten params for data parallel
-        self.rnn.flatten_parameters()
+        # Follow the precision of half precision weights, e.g. of a module
+        # cast with .to(torch.bfloat16) for inference (without autocast)
+        weight = getattr(self.rnn, "weight_ih_l0", None)
+        if weight is not None and weight.dtype in _HALF_DTYPES:
+            x = x.to(weight.dtype)
+
+        # Flatten params for data parallel replicas. Other modules are
+        # flattened by torch whenever they are moved (e.g. with .to())
+        if getattr(self.rnn, "_is_replica", False):
+            self.rnn.flatten_parameters()
 
         # Pack sequence for proper RNN handling of padding
         if lengths is not None:
@@ -448,7 +513,7 @@ class RNNCell(nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[1:]))
+            input_size = int(np.prod(input_shape[1:]))
 
         kwargs = {
             "input_size": input_size,
@@ -463,14 +528,13 @@ class RNNCell(nn.Module):
         for i in range(self.num_layers - 1):
             self.rnn_cells.append(torch.nn.RNNCell(**kwargs))
 
-        self.dropout_layers = nn.ModuleList(
-            [torch.nn.Dropout(p=dropout) for _ in range(self.num_layers - 1)]
-        )
+        # Applied between the layers
+        self.dropout = dropout
 
         if re_init:
             rnn_init(self.rnn_cells)
 
-    def forward(self, x, hx=None):
+    def forward(self, x, hx: Optional[Tensor] = None):
         """Returns the output of the RNNCell.
 
         Arguments
@@ -484,14 +548,19 @@ class RNNCell(nn.Module):
         if hx is None:
             hx = x.new_zeros(self.num_layers, x.shape[0], self.hidden_size)
 
-        h = self.rnn_cells[0](x, hx[0])
-        hidden_lst = [h]
-        for i in range(1, self.num_layers):
-            drop_h = self.dropout_layers[i - 1](h)
-            h = self.rnn_cells[i](drop_h, hx[i])
-            hidden_lst.append(h)
+        # Iterating over the cells (rather than indexing them) keeps the
+        # loop scriptable, e.g. through the jit_module_keys of the Brain
+        h = x
+        hidden = x.new_empty(self.num_layers, x.shape[0], self.hidden_size)
+        for i, rnn_cell in enumerate(self.rnn_cells):
+            if i > 0 and self.training and self.dropout > 0:
+                h = torch.nn.functional.dropout(h, self.dropout, True)
+            if torch.jit.is_scripting():
+                h = rnn_cell(h, hx[i])
+            else:
+                h = cell_forward(rnn_cell, h, hx[i])
+            hidden[i] = h
 
-        hidden = torch.stack(hidden_lst, dim=0)
         return h, hidden
 
 
@@ -553,7 +622,7 @@ class GRUCell(nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[1:]))
+            input_size = int(np.prod(input_shape[1:]))
 
         kwargs = {
             "input_size": input_size,
@@ -567,14 +636,13 @@ class GRUCell(nn.Module):
         for i in range(self.num_layers - 1):
             self.rnn_cells.append(torch.nn.GRUCell(**kwargs))
 
-        self.dropout_layers = nn.ModuleList(
-            [torch.nn.Dropout(p=dropout) for _ in range(self.num_layers - 1)]
-        )
+        # Applied between the layers
+        self.dropout = dropout
 
         if re_init:
             rnn_init(self.rnn_cells)
 
-    def forward(self, x, hx=None):
+    def forward(self, x, hx: Optional[Tensor] = None):
         """Returns the output of the GRUCell.
 
         Arguments
@@ -589,14 +657,19 @@ class GRUCell(nn.Module):
         if hx is None:
             hx = x.new_zeros(self.num_layers, x.shape[0], self.hidden_size)
 
-        h = self.rnn_cells[0](x, hx[0])
-        hidden_lst = [h]
-        for i in range(1, self.num_layers):
-            drop_h = self.dropout_layers[i - 1](h)
-            h = self.rnn_cells[i](drop_h, hx[i])
-            hidden_lst.append(h)
+        # Iterating over the cells (rather than indexing them) keeps the
+        # loop scriptable, e.g. through the jit_module_keys of the Brain
+        h = x
+        hidden = x.new_empty(self.num_layers, x.shape[0], self.hidden_size)
+        for i, rnn_cell in enumerate(self.rnn_cells):
+            if i > 0 and self.training and self.dropout > 0:
+                h = torch.nn.functional.dropout(h, self.dropout, True)
+            if torch.jit.is_scripting():
+                h = rnn_cell(h, hx[i])
+            else:
+                h = cell_forward(rnn_cell, h, hx[i])
+            hidden[i] = h
 
-        hidden = torch.stack(hidden_lst, dim=0)
         return h, hidden
 
 
@@ -658,7 +731,7 @@ class LSTMCell(nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[1:]))
+            input_size = int(np.prod(input_shape[1:]))
 
         kwargs = {
             "input_size": input_size,
@@ -672,14 +745,13 @@ class LSTMCell(nn.Module):
         for i in range(self.num_layers - 1):
             self.rnn_cells.append(torch.nn.LSTMCell(**kwargs))
 
-        self.dropout_layers = nn.ModuleList(
-            [torch.nn.Dropout(p=dropout) for _ in range(self.num_layers - 1)]
-        )
+        # Applied between the layers
+        self.dropout = dropout
 
         if re_init:
             rnn_init(self.rnn_cells)
 
-    def forward(self, x, hx=None):
+    def forward(self, x, hx: Optional[Tuple[Tensor, Tensor]] = None):
         """Returns the output of the LSTMCell.
 
         Arguments
@@ -696,18 +768,22 @@ class LSTMCell(nn.Module):
                 x.new_zeros(self.num_layers, x.shape[0], self.hidden_size),
             )
 
-        h, c = self.rnn_cells[0](x, (hx[0][0], hx[1][0]))
-        hidden_lst = [h]
-        cell_lst = [c]
-        for i in range(1, self.num_layers):
-            drop_h = self.dropout_layers[i - 1](h)
-            h, c = self.rnn_cells[i](drop_h, (hx[0][i], hx[1][i]))
-            hidden_lst.append(h)
-            cell_lst.append(c)
+        # Iterating over the cells (rather than indexing them) keeps the
+        # loop scriptable, e.g. through the jit_module_keys of the Brain
+        # The hidden and cell states of all the layers share one buffer
+        h = x
+        states = x.new_empty(2, self.num_layers, x.shape[0], self.hidden_size)
+        for i, rnn_cell in enumerate(self.rnn_cells):
+            if i > 0 and self.training and self.dropout > 0:
+                h = torch.nn.functional.dropout(h, self.dropout, True)
+            if torch.jit.is_scripting():
+                h, c = rnn_cell(h, (hx[0][i], hx[1][i]))
+            else:
+                h, c = cell_forward(rnn_cell, h, (hx[0][i], hx[1][i]))
+            states[0, i] = h
+            states[1, i] = c
 
-        hidden = torch.stack(hidden_lst, dim=0)
-        cell = torch.stack(cell_lst, dim=0)
-        return h, (hidden, cell)
+        return h, (states[0], states[1])
 
 
 class AttentionalRNNDecoder(nn.Module):
@@ -901,15 +977,26 @@ class AttentionalRNNDecoder(nn.Module):
         w : torch.Tensor
             The weight of attention.
         """
+        cell_out, hs, c, w = self._recurrent_step(
+            inp, hs, c, enc_states, enc_len
+        )
+        dec_out = torch.cat([c, cell_out], dim=1)
+        dec_out = self.proj(dec_out)
+
+        return dec_out, hs, c, w
+
+    def _recurrent_step(self, inp, hs, c, enc_states, enc_len):
+        """Runs the cells and the attention for one timestep, i.e. the
+        forward_step without the output projection.
+        """
         cell_inp = torch.cat([inp, c], dim=-1)
-        cell_inp = self.drop(cell_inp)
+        if self.training and self.dropout > 0:
+            cell_inp = self.drop(cell_inp)
         cell_out, hs = self.rnn(cell_inp, hs)
 
         c, w = self.attn(enc_states, enc_len, cell_out)
-        dec_out = torch.cat([c, cell_out], dim=1)
-        dec_out = self.proj(dec_out)
 
-        return dec_out, hs, c, w
+        return cell_out, hs, c, w
 
     def forward(self, inp_tensor, enc_states, wav_len):
         """This method implements the forward pass of the attentional RNN decoder.
@@ -931,7 +1018,7 @@ class AttentionalRNNDecoder(nn.Module):
             The attention weight of each timestep.
         """
         # calculating the actual length of enc_states
-        enc_len = torch.round(enc_states.shape[1] * wav_len).long()
+        enc_len = (wav_len * enc_states.shape[1]).round_().long()
 
         # initialization
         self.attn.reset()
@@ -940,17 +1027,23 @@ class AttentionalRNNDecoder(nn.Module):
         )
         hs = None
 
-        # store predicted tokens
-        outputs_lst, attn_lst = [], []
+        # The output projection does not feed back into the recurrence, so
+        # it is applied to all the timesteps at once after the loop
+        cell_out_lst, c_lst, attn_lst = [], [], []
         for t in range(inp_tensor.shape[1]):
-            outputs, hs, c, w = self.forward_step(
+            cell_out, hs, c, w = self._recurrent_step(
                 inp_tensor[:, t], hs, c, enc_states, enc_len
             )
-            outputs_lst.append(outputs)
+            cell_out_lst.append(cell_out)
+            c_lst.append(c)
             attn_lst.append(w)
 
         # [B, L_d, hidden_size]
-        outputs = torch.stack(outputs_lst, dim=1)
+        outputs = torch.cat(
+            [torch.stack(c_lst, dim=1), torch.stack(cell_out_lst, dim=1)],
+            dim=-1,
+        )
+        outputs = self.proj(outputs)
 
         # [B, L_d, L_e]
         attn = torch.stack(attn_lst, dim=1)
@@ -1037,7 +1130,7 @@ class LiGRU(torch.nn.Module):
         # Computing the feature dimensionality
         if len(input_shape) > 3:
             self.reshape = True
-        self.fea_dim = float(torch.prod(torch.tensor(input_shape[2:])))
+        self.fea_dim = float(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
         self.rnn = self._init_layers()
 
@@ -1088,6 +1181,23 @@ class LiGRU(torch.nn.Module):
 
         return output, hh
 
+    def fuse_batchnorm(self):
+        """Folds the batch normalization of every layer into its input
+        projection, for inference (see LiGRU_Layer.fuse_batchnorm).
+
+        Example
+        -------
+        >>> inp_tensor = torch.rand([4, 10, 20])
+        >>> net = LiGRU(input_shape=inp_tensor.shape, hidden_size=5).eval()
+        >>> out_tensor, _ = net(inp_tensor)
+        >>> net.fuse_batchnorm()
+        >>> out_fused, _ = net(inp_tensor)
+        >>> torch.allclose(out_tensor, out_fused, atol=1e-6)
+        True
+        """
+        for ligru_lay in self.rnn:
+            ligru_lay.fuse_batchnorm()
+
     def _forward_ligru(self, x, hx: Optional[Tensor]):
         """Returns the output of the vanilla liGRU.
 
@@ -1120,6 +1230,25 @@ class LiGRU(torch.nn.Module):
         return x, h
 
 
+@torch.jit.script
+def _ligru_step(gates, ht, drop_mask, nonlinearity: str):
+    """Returns the new liGRU hidden state, given the gate pre-activations
+    of the time step. It is a tensor-only scripted function, so that the
+    JIT fuses the pointwise operations of every time step into one kernel.
+    """
+    at, zt = gates.chunk(2, 1)
+    if nonlinearity == "tanh":
+        at = torch.tanh(at)
+    elif nonlinearity == "sin":
+        at = torch.sin(at)
+    elif nonlinearity == "leaky_relu":
+        at = torch.nn.functional.leaky_relu(at)
+    else:
+        at = torch.relu(at)
+    zt = torch.sigmoid(zt)
+    return zt * ht + (1 - zt) * (at * drop_mask)
+
+
 class LiGRU_Layer(torch.nn.Module):
     """ This function implements Light-Gated Recurrent Units (ligru) layer.
 
@@ -1191,18 +1320,11 @@ class LiGRU_Layer(torch.nn.Module):
         # Initial state
         self.register_buffer("h_init", torch.zeros(1, self.hidden_size))
 
-        # Preloading dropout masks (gives some speed improvement)
+        # Recurrent dropout
         self._init_drop(self.batch_size)
 
-        # Setting the activation function
-        if nonlinearity == "tanh":
-            self.act = torch.nn.Tanh()
-        elif nonlinearity == "sin":
-            self.act = torch.sin
-        elif nonlinearity == "leaky_relu":
-            self.act = torch.nn.LeakyReLU()
-        else:
-            self.act = torch.nn.ReLU()
+        # The activation function (tanh, sin, leaky_relu or relu otherwise)
+        self.nonlinearity = nonlinearity
 
     def forward(self, x, hx: Optional[Tensor] = None):
         # type: (Tensor, Optional[Tensor]) -> Tensor # noqa F821
@@ -1213,15 +1335,16 @@ class LiGRU_Layer(torch.nn.Module):
         x : torch.Tensor
             Input tensor.
         """
+        # Feed-forward affine transformations (all steps in parallel)
+        w = self.w(x)
+
+        # The transformation is applied to each step independently, so the
+        # backward direction reuses the projections of the forward one
         if self.bidirectional:
-            x_flip = x.flip(1)
-            x = torch.cat([x, x_flip], dim=0)
+            w = torch.cat([w, w.flip(1)], dim=0)
 
         # Change batch size if needed
-        self._change_batch_size(x)
-
-        # Feed-forward affine transformations (all steps in parallel)
-        w = self.w(x)
+        self._change_batch_size(w)
 
         # Apply batch normalization
         if self.normalize:
@@ -1254,13 +1377,20 @@ class LiGRU_Layer(torch.nn.Module):
         # Sampling dropout mask
         drop_mask = self._sample_drop_mask(w)
 
-        # Loop over time axis
-        for k in range(w.shape[1]):
-            gates = w[:, k] + self.u(ht)
-            at, zt = gates.chunk(2, 1)
-            zt = torch.sigmoid(zt)
-            hcand = self.act(at) * drop_mask
-            ht = zt * ht + (1 - zt) * hcand
+        # The initial state may be shared by the batch (e.g. h_init). It is
+        # made a dense (batch, hidden) tensor, so that every step of the
+        # recurrence sees the same shapes and strides
+        ht = ht.expand(w.shape[0], ht.shape[1]).contiguous()
+
+        # Loop over time axis, adding the recurrent term within the GEMM.
+        # A contiguous copy of the transposed weights, made once for all the
+        # steps, gives faster GEMMs than the strided view
+        # The same holds for the time-major copy of the input projections
+        u = self.u.weight.t().contiguous()
+        w = w.transpose(0, 1).contiguous()
+        for k in range(w.shape[0]):
+            gates = torch.addmm(w[k], ht, u)
+            ht = _ligru_step(gates, ht, drop_mask, self.nonlinearity)
             hiddens.append(ht)
 
         # Stacking hidden states
@@ -1268,40 +1398,22 @@ class LiGRU_Layer(torch.nn.Module):
         return h
 
     def _init_drop(self, batch_size):
-        """Initializes the recurrent dropout operation. To speed it up,
-        the dropout masks are sampled in advance.
+        """Initializes the recurrent dropout operation. A new dropout mask
+        is sampled for each batch, and shared by all the time steps.
         """
-        self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
-        self.N_drop_masks = 16000
-        self.drop_mask_cnt = 0
-
-        self.register_buffer(
-            "drop_masks",
-            self.drop(torch.ones(self.N_drop_masks, self.hidden_size)).data,
-        )
         self.register_buffer("drop_mask_te", torch.tensor([1.0]).float())
 
     def _sample_drop_mask(self, w):
-        """Selects one of the pre-defined dropout masks"""
-        if self.training:
-
-            # Sample new masks when needed
-            if self.drop_mask_cnt + self.batch_size > self.N_drop_masks:
-                self.drop_mask_cnt = 0
-                self.drop_masks = self.drop(
-                    torch.ones(
-                        self.N_drop_masks, self.hidden_size, device=w.device
-                    )
-                ).data
-
-            # Sampling the mask
-            drop_mask = self.drop_masks[
-                self.drop_mask_cnt : self.drop_mask_cnt + self.batch_size
-            ]
-            self.drop_mask_cnt = self.drop_mask_cnt + self.batch_size
+        """Samples the dropout mask of the current batch"""
+        if self.training and self.dropout > 0:
+            drop_mask = torch.nn.functional.dropout(
+                torch.ones(w.shape[0], self.hidden_size, device=w.device),
+                self.dropout,
+                True,
+            )
 
         else:
-            self.drop_mask_te = self.drop_mask_te.to(w.device)
+            # A buffer, already on the device of the layer
             drop_mask = self.drop_mask_te
 
         return drop_mask
@@ -1310,17 +1422,65 @@ class LiGRU_Layer(torch.nn.Module):
         """This function changes the batch size when it is different from
         the one detected in the initialization method. This might happen in
         the case of multi-gpu or when we have different batch sizes in train
-        and test. We also update the h_int and drop masks.
+        and test.
         """
         if self.batch_size != x.shape[0]:
             self.batch_size = x.shape[0]
 
-            if self.training:
-                self.drop_masks = self.drop(
-                    torch.ones(
-                        self.N_drop_masks, self.hidden_size, device=x.device,
-                    )
-                ).data
+    def fuse_batchnorm(self):
+        """Folds the batch normalization into the input projection, for
+        inference. The running statistics of the normalization are
+        frozen, so that it is an affine transformation of the projected
+        features, which is merged with the weights of self.w (with a new
+        bias). Layers with another normalization are left unchanged.
+        """
+        if self.training:
+            raise ValueError("Batch normalization is only fused in eval mode")
+        if not isinstance(self.norm, nn.BatchNorm1d):
+            return
+
+        weight = self.w.weight
+        with torch.no_grad():
+            scale = torch.rsqrt(self.norm.running_var + self.norm.eps)
+            if self.norm.affine:
+                scale = scale * self.norm.weight
+            bias = -self.norm.running_mean * scale
+            if self.norm.affine:
+                bias = bias + self.norm.bias
+
+            self.w = nn.Linear(weight.shape[1], weight.shape[0]).to(weight)
+            self.w.weight.copy_(weight * scale.unsqueeze(1))
+            self.w.bias.copy_(bias)
+
+        self.norm = nn.Identity()
+        self.normalize = False
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        """Ignores the pre-sampled dropout masks stored by older versions."""
+        state_dict.pop(prefix + "drop_masks", None)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+
+@torch.jit.script
+def _forget_mult(f, x, hidden: Optional[Tensor]):
+    """Returns the QRNN hidden states, h_t = f_t * x_t + (1 - f_t) * h_t-1,
+    for inputs formatted as (time, batch, fea). The recurrence is scripted,
+    so that the time loop runs in the TorchScript interpreter rather than
+    in Python.
+    """
+    result = []
+    htm1 = hidden
+
+    for i in range(f.shape[0]):
+        if htm1 is None:
+            h_t = f[i] * x[i]
+        else:
+            # h_t-1 + f_t * (x_t - h_t-1), i.e. one fused multiply-add
+            h_t = torch.addcmul(htm1, f[i], x[i] - htm1)
+        result.append(h_t)
+        htm1 = h_t
+
+    return torch.stack(result)
 
 
 class QuasiRNNLayer(torch.nn.Module):
@@ -1385,19 +1545,7 @@ class QuasiRNNLayer(torch.nn.Module):
         wx : torch.Tensor
             Linearly transformed input.
         """
-        result = []
-        htm1 = hidden
-        hh = f * x
-
-        for i in range(hh.shape[0]):
-            h_t = hh[i, :, :]
-            ft = f[i, :, :]
-            if htm1 is not None:
-                h_t = h_t + (1 - ft) * htm1
-            result.append(h_t)
-            htm1 = h_t
-
-        return torch.stack(result)
+        return _forget_mult(f, x, hidden)
 
     def split_gate_inputs(self, y):
         # type: (Tensor) -> Tuple[Tensor, Tensor, Optional[Tensor]] # noqa F821
@@ -1424,13 +1572,14 @@ class QuasiRNNLayer(torch.nn.Module):
 
         # give a tensor of shape (time, batch, channel)
         x = x.permute(1, 0, 2)
-        if self.bidirectional:
-            x_flipped = x.flip(0)
-            x = torch.cat([x, x_flipped], dim=1)
 
         # note: this is equivalent to doing 1x1 convolution on the input
         y = self.w(x)
 
+        # the backward direction reuses the projections of the forward one
+        if self.bidirectional:
+            y = torch.cat([y, y.flip(0)], dim=1)
+
         z, f, o = self.split_gate_inputs(y)
 
         z = self.z_gate(z)
@@ -1443,11 +1592,7 @@ class QuasiRNNLayer(torch.nn.Module):
         # keeps the old value
         if self.zoneout:
             if self.training:
-                mask = (
-                    torch.empty(f.shape)
-                    .bernoulli_(1 - self.zoneout)
-                    .to(f.get_device())
-                ).detach()
+                mask = torch.empty_like(f).bernoulli_(1 - self.zoneout)
                 f = f * mask
             else:
                 f = f * (1 - self.zoneout)
@@ -1545,7 +1690,7 @@ class QuasiRNN(nn.Module):
         if input_size is None:
             if len(input_shape) > 3:
                 self.reshape = True
-            input_size = torch.prod(torch.tensor(input_shape[2:]))
+            input_size = int(np.prod(input_shape[2:]))
 
         layers = []
         for layer in range(self.num_layers):
@@ -1604,3 +1749,48 @@ def rnn_init(module):
     for name, param in module.named_parameters():
         if "weight_hh" in name or ".u.weight" in name:
             nn.init.orthogonal_(param)
+
+
+def rnn_quantize(module, dtype=torch.qint8):
+    """Quantizes the weights of the recurrent layers of a module for
+    inference on CPU.
+
+    The weights of the torch LSTM and GRU layers and of the torch recurrent
+    cells (used by LSTM, GRU and the cells of this file) are quantized to
+    int8 (or float16), while the activations stay in floating point and are
+    quantized on the fly. This reduces the weight bandwidth that dominates
+    recurrent inference with small batches. The quantized layers cannot be
+    trained, and vanilla RNN layers (torch.nn.RNN) are left unchanged.
+
+    For liGRU layers, the input projection (a GEMM over all the time steps)
+    is quantized, while the recurrent weights stay in floating point.
+
+    Arguments
+    ---------
+    module : torch.nn.Module
+        Module containing recurrent layers, quantized in place.
+    dtype : torch.dtype
+        Either torch.qint8 or torch.float16.
+
+    Returns
+    -------
+    torch.nn.Module
+        The quantized module.
+
+    Example
+    -------
+    >>> inp_tensor = torch.rand([4, 10, 20])
+    >>> net = LSTM(hidden_size=5, input_shape=inp_tensor.shape).eval()
+    >>> net = rnn_quantize(net)
+    >>> out_tensor, _ = net(inp_tensor)
+    >>> out_tensor.shape
+    torch.Size([4, 10, 5])
+    """
+    qconfig_spec = {nn.LSTM, nn.GRU, nn.LSTMCell, nn.GRUCell, nn.RNNCell}
+    for name, layer in module.named_modules():
+        if isinstance(layer, LiGRU_Layer):
+            qconfig_spec.add(name + ".w" if name else "w")
+
+    return torch.quantization.quantize_dynamic(
+        module, qconfig_spec, dtype=dtype, inplace=True
+    )
@@ -7,15 +7,73 @@ Authors
 """
 
 import torch
+import inspect
 import logging
 import torch.nn as nn
 import numpy as np
 from typing import Optional
 from speechbrain.dataio.dataio import length_to_mask
 
+try:
+    from torch._dynamo import is_compiling as _dynamo_is_compiling
+except ImportError:  # torch < 2.0
+
+    def _dynamo_is_compiling():
+        return False
+
+
+# fused attention kernels and their is_causal hint, torch >= 2.0
+_HAS_SDPA = hasattr(torch.nn.functional, "scaled_dot_product_attention")
+_MHA_IS_CAUSAL = (
+    "is_causal" in inspect.signature(nn.MultiheadAttention.forward).parameters
+)
+
 logger = logging.getLogger(__name__)
 
 
+@torch.jit.unused
+def _is_compiling():
+    """Returns True while torch.compile traces the code."""
+    return _dynamo_is_compiling()
+
+
+@torch.jit.unused
+def _autocast_dtype(tensor):
+    """Returns the dtype in which autocast computes the matmuls of tensor,
+    or its own dtype when autocast is disabled for its device.
+    """
+    if tensor.is_cuda:
+        enabled, get_dtype = "is_autocast_enabled", "get_autocast_gpu_dtype"
+    else:
+        enabled, get_dtype = "is_autocast_cpu_enabled", "get_autocast_cpu_dtype"
+    if hasattr(torch, get_dtype) and getattr(torch, enabled)():
+        return getattr(torch, get_dtype)()
+    return tensor.dtype
+
+
+@torch.jit.unused
+def _cast_shared(tensors, dtype):
+    """Casts tensors to dtype, keeping those that are the same tensor as
+    the previous one shared.
+    """
+    casted = []
+    for i, tensor in enumerate(tensors):
+        if i > 0 and tensor is tensors[i - 1]:
+            casted.append(casted[-1])
+        else:
+            casted.append(tensor.to(dtype))
+    return tuple(casted)
+
+
+def _version(tensor):
+    """Returns the version counter of a tensor, or None for the tensors
+    created under torch.inference_mode, which do not track it.
+    """
+    if getattr(tensor, "is_inference", None) and tensor.is_inference():
+        return None
+    return tensor._version
+
+
 class ContentBasedAttention(nn.Module):
     """ This class implements content-based attention module for seq2seq
     learning.
@@ -86,21 +144,27 @@ class ContentBasedAttention(nn.Module):
                 enc_len, max_len=enc_states.size(1), device=enc_states.device
             )
 
-        dec_h = self.mlp_dec(dec_states.unsqueeze(1))
+        # Several consecutive queries may share one encoder sequence
+        # (e.g. the hypotheses of a beam search): [B*N, D] -> [B, N, 1, D]
+        batch_size, n_queries = _query_groups(enc_states, dec_states)
+        dec_h = self.mlp_dec(dec_states).view(batch_size, n_queries, 1, -1)
         attn = self.mlp_attn(
-            torch.tanh(self.precomputed_enc_h + dec_h)
+            torch.tanh(self.precomputed_enc_h.unsqueeze(1) + dec_h)
         ).squeeze(-1)
 
         # mask the padded frames
-        attn = attn.masked_fill(self.mask == 0, -np.inf)
-        attn = self.softmax(attn * self.scaling)
+        attn = attn.masked_fill(self.mask.unsqueeze(1) == 0, -np.inf)
+
+        # the softmax over long encoder sequences is kept in float32 when
+        # the scores are computed in half precision (e.g. with autocast)
+        attn = self.softmax(attn.float() * self.scaling).type_as(enc_states)
 
         # compute context vectors
-        # [B, 1, L] X [B, L, F]
-        context = torch.bmm(attn.unsqueeze(1), enc_states).squeeze(1)
+        # [B, N, L] X [B, L, F]
+        context = torch.bmm(attn, enc_states)
         context = self.mlp_out(context)
 
-        return context, attn
+        return context.flatten(0, 1), attn.flatten(0, 1)
 
 
 class LocationAwareAttention(nn.Module):
@@ -201,33 +265,43 @@ class LocationAwareAttention(nn.Module):
                 enc_len, max_len=enc_states.size(1), device=enc_states.device
             )
 
-            # multiply mask by 1/Ln for each row
+        # Several consecutive queries may share one encoder sequence
+        # (e.g. the hypotheses of a beam search): [B*N, D] -> [B, N, 1, D]
+        batch_size, n_queries = _query_groups(enc_states, dec_states)
+
+        if self.prev_attn is None:
+            # multiply mask by 1/Ln for each row, one row per query
             self.prev_attn = self.mask * (1 / enc_len.float()).unsqueeze(1)
+            self.prev_attn = self.prev_attn.repeat_interleave(n_queries, 0)
 
         # compute location-aware features
-        # [B, 1, L] -> [B, C, L]
+        # [B*N, 1, L] -> [B*N, C, L]
         attn_conv = self.conv_loc(self.prev_attn.unsqueeze(1))
-        # [B, C, L] -> [B, L, C] -> [B, L, F]
+        # [B*N, C, L] -> [B*N, L, C] -> [B, N, L, F]
         attn_conv = self.mlp_loc(attn_conv.transpose(1, 2))
+        attn_conv = attn_conv.view(batch_size, n_queries, *attn_conv.shape[1:])
 
-        dec_h = self.mlp_dec(dec_states.unsqueeze(1))
+        dec_h = self.mlp_dec(dec_states).view(batch_size, n_queries, 1, -1)
         attn = self.mlp_attn(
-            torch.tanh(self.precomputed_enc_h + dec_h + attn_conv)
+            torch.tanh(self.precomputed_enc_h.unsqueeze(1) + dec_h + attn_conv)
         ).squeeze(-1)
 
         # mask the padded frames
-        attn = attn.masked_fill(self.mask == 0, -np.inf)
-        attn = self.softmax(attn * self.scaling)
+        attn = attn.masked_fill(self.mask.unsqueeze(1) == 0, -np.inf)
 
-        # set prev_attn to current attn for the next timestep
-        self.prev_attn = attn.detach()
+        # softmax in float32, as in ContentBasedAttention
+        attn = self.softmax(attn.float() * self.scaling).type_as(enc_states)
 
         # compute context vectors
-        # [B, 1, L] X [B, L, F]
-        context = torch.bmm(attn.unsqueeze(1), enc_states).squeeze(1)
+        # [B, N, L] X [B, L, F]
+        context = torch.bmm(attn, enc_states)
         context = self.mlp_out(context)
 
-        return context, attn
+        attn = attn.flatten(0, 1)
+        # set prev_attn to current attn for the next timestep
+        self.prev_attn = attn.detach()
+
+        return context.flatten(0, 1), attn
 
 
 class KeyValueAttention(nn.Module):
@@ -297,12 +371,35 @@ class KeyValueAttention(nn.Module):
                 enc_len, max_len=enc_states.size(1), device=enc_states.device
             ).unsqueeze(2)
 
-        query = self.query_linear(dec_states).unsqueeze(2)
-        scores = torch.matmul(self.keys, query) / self.scaling
+        # Several consecutive queries may share one encoder sequence
+        # (e.g. the hypotheses of a beam search): [B*N, D] -> [B, D, N]
+        batch_size, n_queries = _query_groups(enc_states, dec_states)
+        query = self.query_linear(dec_states).view(batch_size, n_queries, -1)
+        scores = torch.matmul(self.keys, query.transpose(1, 2)) / self.scaling
         scores = scores.masked_fill(self.mask == 0, -np.inf)
-        normalized_scores = scores.softmax(1).transpose(1, 2)
-        out = torch.matmul(normalized_scores, self.values).squeeze(1)
-        return out, normalized_scores
+
+        # the softmax is kept in float32 for half precision scores
+        normalized_scores = scores.float().softmax(1).type_as(self.values)
+        normalized_scores = normalized_scores.transpose(1, 2)
+        out = torch.matmul(normalized_scores, self.values).flatten(0, 1)
+        return out, normalized_scores.flatten(0, 1).unsqueeze(1)
+
+
+def _query_groups(enc_states, dec_states):
+    """Returns the batch size and the number of queries per encoder sequence.
+
+    The attention modules above accept ``B * N`` query vectors for ``B``
+    encoder sequences, where the ``N`` consecutive queries of each group
+    attend to the same sequence. This lets e.g. beam search attend to the
+    encoder states without repeating them ``N`` times.
+    """
+    batch_size = enc_states.shape[0]
+    if dec_states.shape[0] % batch_size != 0:
+        raise ValueError(
+            f"The number of queries ({dec_states.shape[0]}) must be a "
+            f"multiple of the encoder batch size ({batch_size})"
+        )
+    return batch_size, dec_states.shape[0] // batch_size
 
 
 class MultiheadAttention(nn.Module):
@@ -359,6 +456,7 @@ class MultiheadAttention(nn.Module):
             kdim=kdim,
             vdim=vdim,
         )
+        self._kv_cache = None
 
     def forward(
         self,
@@ -367,6 +465,8 @@ class MultiheadAttention(nn.Module):
         value,
         attn_mask: Optional[torch.Tensor] = None,
         key_padding_mask: Optional[torch.Tensor] = None,
+        return_attn_weights: bool = True,
+        is_causal: bool = False,
     ):
         """
         Arguments
@@ -398,6 +498,16 @@ class MultiheadAttention(nn.Module):
             be unchanged. If a BoolTensor is provided, positions with True is
             not allowed to attend while False values will be unchanged. If a
             FloatTensor is provided, it will be added to the attention weight.
+        return_attn_weights : bool
+            Whether to compute and return the attention weights. When False,
+            the attention matrix is never materialized and the computation
+            goes through the fused scaled_dot_product_attention kernels
+            (default: True).
+        is_causal : bool
+            Hint that attn_mask is the causal (lookahead) mask, which lets
+            the fused kernels apply it implicitly when no key_padding_mask
+            is given and return_attn_weights is False. Ignored on torch
+            < 2.0 and under TorchScript (default: False).
 
         Outputs
         -------
@@ -407,22 +517,225 @@ class MultiheadAttention(nn.Module):
         attn_output_weights : tensor
             (N, L, S) where N is the batch size, L is the target
             sequence length, S is the source sequence length.
+            None if return_attn_weights is False.
         """
         # give tensors of shape (time, batch, fea)
-        query = query.permute(1, 0, 2)
-        key = key.permute(1, 0, 2)
-        value = value.permute(1, 0, 2)
-
-        output, attention = self.att(
-            query,
-            key,
-            value,
+        q = query.permute(1, 0, 2)
+        k = key.permute(1, 0, 2)
+        v = value.permute(1, 0, 2)
+
+        # Identity checks are not supported by TorchScript and break the
+        # graphs of torch.compile, so these paths only run in eager mode
+        if not torch.jit.is_scripting() and not _is_compiling():
+            if self._can_cache_kv(
+                query, key, value, attn_mask, key_padding_mask
+            ):
+                return self._cached_kv_attention(
+                    query, key, return_attn_weights
+                )
+
+            # keep shared inputs shared so that torch projects them with a
+            # single packed matmul
+            if key is query:
+                k = q
+            if value is key:
+                v = k
+
+            # The fused kernels require float masks in the dtype of the
+            # projections, while torch casts them to the dtype of the
+            # inputs. Under autocast, the inputs are thus cast upfront, as
+            # autocast does for the projections anyway.
+            if (
+                not return_attn_weights
+                and attn_mask is not None
+                and attn_mask.is_floating_point()
+            ):
+                dtype = _autocast_dtype(q)
+                if dtype != q.dtype:
+                    q, k, v = _cast_shared((q, k, v), dtype)
+                    attn_mask = attn_mask.to(dtype)
+
+        if is_causal and not torch.jit.is_scripting():
+            output, attention = self._causal_att(
+                q, k, v, attn_mask, key_padding_mask, return_attn_weights
+            )
+        else:
+            output, attention = self.att(
+                q,
+                k,
+                v,
+                attn_mask=attn_mask,
+                key_padding_mask=key_padding_mask,
+                need_weights=return_attn_weights,
+            )
+
+        # reshape the output back to (batch, time, fea)
+        output = output.permute(1, 0, 2)
+
+        return output, attention
+
+    @torch.jit.unused
+    def _causal_att(
+        self, q, k, v, attn_mask, key_padding_mask, return_attn_weights
+    ):
+        """Calls torch with the is_causal hint, which only exists in
+        torch >= 2.0 (it is dropped otherwise).
+        """
+        kwargs = {"is_causal": True} if _MHA_IS_CAUSAL else {}
+        return self.att(
+            q,
+            k,
+            v,
             attn_mask=attn_mask,
             key_padding_mask=key_padding_mask,
+            need_weights=return_attn_weights,
+            **kwargs,
         )
 
-        # reshape the output back to (batch, time, fea)
-        output = output.permute(1, 0, 2)
+    @torch.jit.unused
+    def _can_cache_kv(self, query, key, value, attn_mask, key_padding_mask):
+        """Whether the projected keys and values can be reused across calls,
+        i.e. at inference, for unmasked attention over a shared key/value
+        tensor (such as the encoder output in autoregressive decoding).
+        """
+        return (
+            not self.training
+            and key is value
+            and key is not query
+            and attn_mask is None
+            and key_padding_mask is None
+            and self.att.bias_k is None
+            and not self.att.add_zero_attn
+        )
+
+    @torch.jit.unused
+    def _cached_kv_attention(self, query, memory, return_attn_weights):
+        """Attends to memory, projecting it to keys and values only once as
+        long as the same (unmodified) memory tensor and weights are used.
+        The last memory tensor is kept alive by the cache.
+        """
+        versions = tuple(
+            _version(p) for p in (memory,) + self._in_proj_params()
+        )
+        cache = self._kv_cache
+        if cache is None or cache[0] is not memory or cache[1] != versions:
+            cache = (memory, versions) + self.project_kv(memory)
+            self._kv_cache = cache
+
+        return self.attend(
+            query, cache[2], cache[3], return_attn_weights=return_attn_weights
+        )
+
+    def _in_proj_params(self):
+        """Returns the parameters of the input projections."""
+        att = self.att
+        if att._qkv_same_embed_dim:
+            params = (att.in_proj_weight,)
+        else:
+            params = (att.q_proj_weight, att.k_proj_weight, att.v_proj_weight)
+        if att.in_proj_bias is not None:
+            params += (att.in_proj_bias,)
+        return params
+
+    def _in_proj(self, x, index):
+        """Applies the query (0), key (1) or value (2) input projection."""
+        att = self.att
+        rows = slice(index * att.embed_dim, (index + 1) * att.embed_dim)
+        if att._qkv_same_embed_dim:
+            weight = att.in_proj_weight[rows]
+        else:
+            weight = (att.q_proj_weight, att.k_proj_weight, att.v_proj_weight)
+            weight = weight[index]
+        bias = att.in_proj_bias
+        if bias is not None:
+            bias = bias[rows]
+        return torch.nn.functional.linear(x, weight, bias)
+
+    def project_kv(self, key):
+        """Projects a (batch, time, fea) tensor to the keys and values of
+        the heads, for use with ``attend``. Only supported without
+        ``add_bias_kv`` and ``add_zero_attn``.
+
+        Arguments
+        ---------
+        key : tensor
+            (N, S, E) where S is the source sequence length,
+            N is the batch size, E is the embedding dimension.
+
+        Returns
+        -------
+        keys, values : tensor
+            (N, num_heads, S, E / num_heads).
+        """
+        att = self.att
+        if att._qkv_same_embed_dim:
+            # keys and values with a single packed matmul
+            bias = att.in_proj_bias
+            if bias is not None:
+                bias = bias[att.embed_dim :]
+            kv = torch.nn.functional.linear(
+                key, att.in_proj_weight[att.embed_dim :], bias
+            )
+        else:
+            kv = torch.cat((self._in_proj(key, 1), self._in_proj(key, 2)), -1)
+        kv = kv.unflatten(-1, (2, att.num_heads, -1)).permute(2, 0, 3, 1, 4)
+        return kv[0], kv[1]
+
+    def attend(
+        self,
+        query,
+        keys,
+        values,
+        attn_mask: Optional[torch.Tensor] = None,
+        return_attn_weights: bool = True,
+    ):
+        """Attends to keys and values already projected by ``project_kv``.
+        Dropout is not applied, so this is meant for inference.
+
+        Arguments
+        ---------
+        query : tensor
+            (N, L, E) where L is the target sequence length,
+            N is the batch size, E is the embedding dimension.
+        keys : tensor
+            (N, num_heads, S, E / num_heads), from ``project_kv``.
+        values : tensor
+            (N, num_heads, S, E / num_heads), from ``project_kv``.
+        attn_mask : tensor
+            (L, S) float mask added to the attention scores (optional).
+        return_attn_weights : bool
+            Whether to compute and return the attention weights.
+
+        Returns
+        -------
+        attn_output : tensor
+            (N, L, E).
+        attn_output_weights : tensor
+            (N, L, S), averaged over the heads, or None.
+        """
+        q = self._in_proj(query, 0)
+        q = q.unflatten(-1, (self.att.num_heads, -1)).transpose(1, 2)
+
+        attention = None
+        if return_attn_weights or not _HAS_SDPA:
+            scores = torch.matmul(q, keys.transpose(-2, -1))
+            scores = scores * q.shape[-1] ** -0.5
+            if attn_mask is not None:
+                scores = scores + attn_mask
+            weights = scores.softmax(dim=-1)
+            output = torch.matmul(weights, values)
+            if return_attn_weights:
+                # averaged over the heads, as done by torch
+                attention = weights.mean(dim=1)
+        else:
+            if attn_mask is not None:
+                attn_mask = attn_mask.to(q.dtype)
+            output = torch.nn.functional.scaled_dot_product_attention(
+                q, keys, values, attn_mask=attn_mask
+            )
+
+        output = output.transpose(1, 2).flatten(start_dim=2)
+        output = self.att.out_proj(output)
 
         return output, attention
 
@@ -352,7 +352,7 @@ class CConv2d(nn.Module):
             self.init_criterion,
         )
 
-    def forward(self, x, init_params=False):
+    def forward(self, x):
         """Returns the output of the convolution.
 
         Arguments
@@ -361,10 +361,6 @@ class CConv2d(nn.Module):
             (batch, time, feature, channels).
             Input to convolve. 3d or 4d tensors are expected.
         """
-
-        if init_params:
-            self.init_params(x)
-
         # (batch, channel, feature, time)
         x = x.transpose(1, -1)
 
@@ -6,7 +6,10 @@ Authors
 
 import torch
 import logging
+import numpy as np
+from typing import Optional
 from speechbrain.nnet.complex_networks.c_linear import CLinear
+from speechbrain.nnet.complex_networks.c_ops import complex_weight_matrix
 from speechbrain.nnet.complex_networks.c_normalization import (
     CBatchNorm,
     CLayerNorm,
@@ -61,6 +64,9 @@ class CLSTM(torch.nn.Module):
     torch.Size([10, 16, 32])
     """
 
+    # Constant for TorchScript, which then only compiles the taken branch
+    __constants__ = ["return_hidden"]
+
     def __init__(
         self,
         hidden_size,
@@ -88,7 +94,7 @@ class CLSTM(torch.nn.Module):
             self.reshape = True
 
         # Computing the feature dimensionality
-        self.fea_dim = torch.prod(torch.tensor(input_shape[2:]))
+        self.fea_dim = int(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
 
         self.rnn = self._init_layers()
@@ -126,7 +132,7 @@ class CLSTM(torch.nn.Module):
 
         return rnn
 
-    def forward(self, x, hx=None):
+    def forward(self, x, hx: Optional[torch.Tensor] = None):
         """Returns the output of the CLSTM.
 
         Arguments
@@ -147,7 +153,7 @@ class CLSTM(torch.nn.Module):
         else:
             return output
 
-    def _forward_rnn(self, x, hx):
+    def _forward_rnn(self, x, hx: Optional[torch.Tensor]):
         """Returns the output of the CLSTM.
 
         Arguments
@@ -155,26 +161,30 @@ class CLSTM(torch.nn.Module):
         x : torch.Tensor
             Input tensor.
         """
-        h = []
         if hx is not None:
             if self.bidirectional:
                 hx = hx.reshape(
                     self.num_layers, self.batch_size * 2, self.hidden_size
                 )
 
+        # The last hidden state of each layer
+        out_dim = (
+            self.hidden_size * 2 if self.bidirectional else self.hidden_size
+        )
+        h = x.new_empty(self.num_layers, x.shape[0], out_dim)
+
         # Processing the different layers
         for i, rnn_lay in enumerate(self.rnn):
             if hx is not None:
                 x = rnn_lay(x, hx=hx[i])
             else:
                 x = rnn_lay(x, hx=None)
-            h.append(x[:, -1, :])
-        h = torch.stack(h, dim=1)
+            h[i] = x[:, -1, :]
 
         if self.bidirectional:
-            h = h.reshape(h.shape[1] * 2, h.shape[0], self.hidden_size)
-        else:
-            h = h.transpose(0, 1)
+            h = h.transpose(0, 1).reshape(
+                h.shape[0] * 2, h.shape[1], self.hidden_size
+            )
 
         return x, h
 
@@ -252,17 +262,15 @@ class CLSTM_Layer(torch.nn.Module):
         if self.bidirectional:
             self.batch_size = self.batch_size * 2
 
-        # Initial state
-        self.h_init = torch.zeros(1, self.hidden_size * 2, requires_grad=False)
-
-        # Preloading dropout masks (gives some speed improvement)
-        self._init_drop(self.batch_size)
+        # Initial state, a non-persistent buffer so that it follows the
+        # module to its device without changing the checkpoint keys
+        self.register_buffer(
+            "h_init", torch.zeros(1, self.hidden_size * 2), persistent=False
+        )
 
         # Initializing dropout
         self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
 
-        self.drop_mask_te = torch.tensor([1.0]).float()
-
     def forward(self, x, hx=None):
         # type: (Tensor, Optional[Tensor]) -> Tensor # noqa F821
         """Returns the output of the CRNN_layer.
@@ -272,16 +280,14 @@ class CLSTM_Layer(torch.nn.Module):
         x : torch.Tensor
             Input tensor.
         """
-        if self.bidirectional:
-            x_flip = x.flip(1)
-            x = torch.cat([x, x_flip], dim=0)
-
-        # Change batch size if needed
-        self._change_batch_size(x)
-
         # Feed-forward affine transformations (all steps in parallel)
         w = self.w(x)
 
+        # The transformation is applied to each step independently, so the
+        # backward direction reuses the projections of the forward one
+        if self.bidirectional:
+            w = torch.cat([w, w.flip(1)], dim=0)
+
         # Processing time steps
         if hx is not None:
             h = self._complexlstm_cell(w, hx)
@@ -304,87 +310,42 @@ class CLSTM_Layer(torch.nn.Module):
             Linearly transformed input.
         """
 
-        hiddens = []
-
         # Initialise the cell state
         ct = self.h_init
 
         # Sampling dropout mask
-        drop_mask = self._sample_drop_mask()
+        drop_mask = self._sample_drop_mask(w)
+
+        # The recurrent weights are assembled once for the whole sequence
+        u = complex_weight_matrix(self.u.real_weight, self.u.imag_weight)
+
+        # The hidden states of all the steps are written to a single buffer
+        h = w.new_empty(w.shape[0], w.shape[1], ht.shape[-1])
 
         # Loop over time axis
         for k in range(w.shape[1]):
 
-            gates = w[:, k] + self.u(ht)
-            (itr, iti, ftr, fti, otr, oti, ctr, cti) = gates.chunk(8, 1)
-            it = torch.sigmoid(torch.cat([itr, iti], dim=-1))
-            ft = torch.sigmoid(torch.cat([ftr, fti], dim=-1))
-            ot = torch.sigmoid(torch.cat([otr, oti], dim=-1))
+            gates = w[:, k] + torch.addmm(self.u.b, ht, u)
+            # The real and imaginary parts of each gate are adjacent in the
+            # packed output, so each gate is a view of a single slice
+            it, ft, ot, ctc = gates.chunk(4, 1)
+            it = torch.sigmoid(it)
+            ft = torch.sigmoid(ft)
+            ot = torch.sigmoid(ot)
 
-            ct = (
-                it * torch.tanh(torch.cat([ctr, cti], dim=-1)) * drop_mask
-                + ft * ct
-            )
+            ct = it * torch.tanh(ctc) * drop_mask + ft * ct
             ht = ot * torch.tanh(ct)
-            hiddens.append(ht)
+            h[:, k] = ht
 
-        # Stacking hidden states
-        h = torch.stack(hiddens, dim=1)
         return h
 
-    def _init_drop(self, batch_size):
-        """Initializes the recurrent dropout operation. To speed it up,
-        the dropout masks are sampled in advance.
+    def _sample_drop_mask(self, w):
+        """Samples the recurrent dropout mask of the batch, shared by all the
+        time steps.
         """
-
-        self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
-        self.drop_mask_te = torch.tensor([1.0]).float()
-
-        self.N_drop_masks = 16000
-        self.drop_mask_cnt = 0
-
-        self.drop_masks = self.drop(
-            torch.ones(self.N_drop_masks, self.hidden_size * 2)
-        ).data
-
-    def _sample_drop_mask(self,):
-        """Selects one of the pre-defined dropout masks
-        """
-
-        if self.training:
-
-            # Sample new masks when needed
-            if self.drop_mask_cnt + self.batch_size > self.N_drop_masks:
-                self.drop_mask_cnt = 0
-                self.drop_masks = self.drop(
-                    torch.ones(self.N_drop_masks, self.hidden_size * 2,)
-                ).data
-
-            # Sampling the mask
-            drop_mask = self.drop_masks[
-                self.drop_mask_cnt : self.drop_mask_cnt + self.batch_size
-            ]
-            self.drop_mask_cnt = self.drop_mask_cnt + self.batch_size
-
-        else:
-            drop_mask = self.drop_mask_te
-
-        return drop_mask
-
-    def _change_batch_size(self, x):
-        """This function changes the batch size when it is different from
-        the one detected in the initialization method. This might happen in
-        the case of multi-gpu or when we have different batch sizes in train
-        and test. We also update the h_int and drop masks.
-        """
-
-        if self.batch_size != x.shape[0]:
-            self.batch_size = x.shape[0]
-
-            if self.training:
-                self.drop_masks = self.drop(
-                    torch.ones(self.N_drop_masks, self.hidden_size * 2,)
-                ).data
+        if self.training and self.dropout > 0:
+            return self.drop(w.new_ones(w.shape[0], self.hidden_size * 2))
+        return w.new_ones(())
 
 
 class CRNN(torch.nn.Module):
@@ -435,6 +396,9 @@ class CRNN(torch.nn.Module):
     torch.Size([10, 16, 32])
     """
 
+    # Constant for TorchScript, which then only compiles the taken branch
+    __constants__ = ["return_hidden"]
+
     def __init__(
         self,
         hidden_size,
@@ -464,7 +428,7 @@ class CRNN(torch.nn.Module):
             self.reshape = True
 
         # Computing the feature dimensionality
-        self.fea_dim = torch.prod(torch.tensor(input_shape[2:]))
+        self.fea_dim = int(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
 
         self.rnn = self._init_layers()
@@ -503,7 +467,7 @@ class CRNN(torch.nn.Module):
 
         return rnn
 
-    def forward(self, x, hx=None):
+    def forward(self, x, hx: Optional[torch.Tensor] = None):
         """Returns the output of the vanilla CRNN.
 
         Arguments
@@ -523,7 +487,7 @@ class CRNN(torch.nn.Module):
         else:
             return output
 
-    def _forward_rnn(self, x, hx):
+    def _forward_rnn(self, x, hx: Optional[torch.Tensor]):
         """Returns the output of the vanilla CRNN.
 
         Arguments
@@ -531,26 +495,30 @@ class CRNN(torch.nn.Module):
         x : torch.Tensor
         """
 
-        h = []
         if hx is not None:
             if self.bidirectional:
                 hx = hx.reshape(
                     self.num_layers, self.batch_size * 2, self.hidden_size
                 )
 
+        # The last hidden state of each layer
+        out_dim = (
+            self.hidden_size * 2 if self.bidirectional else self.hidden_size
+        )
+        h = x.new_empty(self.num_layers, x.shape[0], out_dim)
+
         # Processing the different layers
         for i, rnn_lay in enumerate(self.rnn):
             if hx is not None:
                 x = rnn_lay(x, hx=hx[i])
             else:
                 x = rnn_lay(x, hx=None)
-            h.append(x[:, -1, :])
-        h = torch.stack(h, dim=1)
+            h[i] = x[:, -1, :]
 
         if self.bidirectional:
-            h = h.reshape(h.shape[1] * 2, h.shape[0], self.hidden_size)
-        else:
-            h = h.transpose(0, 1)
+            h = h.transpose(0, 1).reshape(
+                h.shape[0] * 2, h.shape[1], self.hidden_size
+            )
 
         return x, h
 
@@ -630,17 +598,15 @@ class CRNN_Layer(torch.nn.Module):
         if self.bidirectional:
             self.batch_size = self.batch_size * 2
 
-        # Initial state
-        self.h_init = torch.zeros(1, self.hidden_size * 2, requires_grad=False)
-
-        # Preloading dropout masks (gives some speed improvement)
-        self._init_drop(self.batch_size)
+        # Initial state, a non-persistent buffer so that it follows the
+        # module to its device without changing the checkpoint keys
+        self.register_buffer(
+            "h_init", torch.zeros(1, self.hidden_size * 2), persistent=False
+        )
 
         # Initializing dropout
         self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
 
-        self.drop_mask_te = torch.tensor([1.0]).float()
-
         # Setting the activation function
         if nonlinearity == "tanh":
             self.act = torch.nn.Tanh()
@@ -657,16 +623,14 @@ class CRNN_Layer(torch.nn.Module):
             Input tensor.
         """
 
-        if self.bidirectional:
-            x_flip = x.flip(1)
-            x = torch.cat([x, x_flip], dim=0)
-
-        # Change batch size if needed
-        # self._change_batch_size(x)
-
         # Feed-forward affine transformations (all steps in parallel)
         w = self.w(x)
 
+        # The transformation is applied to each step independently, so the
+        # backward direction reuses the projections of the forward one
+        if self.bidirectional:
+            w = torch.cat([w, w.flip(1)], dim=0)
+
         # Processing time steps
         if hx is not None:
             h = self._complexrnn_cell(w, hx)
@@ -689,74 +653,31 @@ class CRNN_Layer(torch.nn.Module):
             Linearly transformed input.
         """
 
-        hiddens = []
-
         # Sampling dropout mask
-        drop_mask = self._sample_drop_mask()
+        drop_mask = self._sample_drop_mask(w)
+
+        # The recurrent weights are assembled once for the whole sequence
+        u = complex_weight_matrix(self.u.real_weight, self.u.imag_weight)
+        ht = ht.expand(w.shape[0], -1)
+
+        # The hidden states of all the steps are written to a single buffer
+        h = w.new_empty(w.shape[0], w.shape[1], ht.shape[-1])
 
         # Loop over time axis
         for k in range(w.shape[1]):
-            at = w[:, k] + self.u(ht)
+            at = torch.addmm(w[:, k], ht, u)
             ht = self.act(at) * drop_mask
-            hiddens.append(ht)
+            h[:, k] = ht
 
-        # Stacking hidden states
-        h = torch.stack(hiddens, dim=1)
         return h
 
-    def _init_drop(self, batch_size):
-        """Initializes the recurrent dropout operation. To speed it up,
-        the dropout masks are sampled in advance.
+    def _sample_drop_mask(self, w):
+        """Samples the recurrent dropout mask of the batch, shared by all the
+        time steps.
         """
-
-        self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
-        self.drop_mask_te = torch.tensor([1.0]).float()
-
-        self.N_drop_masks = 16000
-        self.drop_mask_cnt = 0
-
-        self.drop_masks = self.drop(
-            torch.ones(self.N_drop_masks, self.hidden_size * 2,)
-        ).data
-
-    def _sample_drop_mask(self,):
-        """Selects one of the pre-defined dropout masks.
-        """
-
-        if self.training:
-
-            # Sample new masks when needed
-            if self.drop_mask_cnt + self.batch_size > self.N_drop_masks:
-                self.drop_mask_cnt = 0
-                self.drop_masks = self.drop(
-                    torch.ones(self.N_drop_masks, self.hidden_size * 2,)
-                ).data
-
-            # Sampling the mask
-            drop_mask = self.drop_masks[
-                self.drop_mask_cnt : self.drop_mask_cnt + self.batch_size
-            ]
-            self.drop_mask_cnt = self.drop_mask_cnt + self.batch_size
-
-        else:
-            drop_mask = self.drop_mask_te
-
-        return drop_mask
-
-    def _change_batch_size(self, x):
-        """This function changes the batch size when it is different from
-        the one detected in the initialization method. This might happen in
-        the case of multi-gpu or when we have different batch sizes in train
-        and test. We also update the h_int and drop masks.
-        """
-
-        if self.batch_size != x.shape[0]:
-            self.batch_size = x.shape[0]
-
-            if self.training:
-                self.drop_masks = self.drop(
-                    torch.ones(self.N_drop_masks, self.hidden_size * 2,)
-                ).data
+        if self.training and self.dropout > 0:
+            return self.drop(w.new_ones(w.shape[0], self.hidden_size * 2))
+        return w.new_ones(())
 
 
 class CLiGRU(torch.nn.Module):
@@ -822,6 +743,9 @@ class CLiGRU(torch.nn.Module):
     torch.Size([4, 10, 5])
     """
 
+    # Constant for TorchScript, which then only compiles the taken branch
+    __constants__ = ["return_hidden"]
+
     def __init__(
         self,
         hidden_size,
@@ -852,7 +776,7 @@ class CLiGRU(torch.nn.Module):
         if len(input_shape) > 3:
             self.reshape = True
 
-        self.fea_dim = torch.prod(torch.tensor(input_shape[2:]))
+        self.fea_dim = int(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
         self.rnn = self._init_layers()
 
@@ -889,7 +813,7 @@ class CLiGRU(torch.nn.Module):
                 current_dim = self.hidden_size
         return rnn
 
-    def forward(self, x, hx=None):
+    def forward(self, x, hx: Optional[torch.Tensor] = None):
         """Returns the output of the CliGRU.
 
         Arguments
@@ -911,7 +835,7 @@ class CLiGRU(torch.nn.Module):
         else:
             return output
 
-    def _forward_ligru(self, x, hx):
+    def _forward_ligru(self, x, hx: Optional[torch.Tensor]):
         """Returns the output of the CliGRU.
 
         Arguments
@@ -920,25 +844,30 @@ class CLiGRU(torch.nn.Module):
             Input tensor.
         """
 
-        h = []
         if hx is not None:
             if self.bidirectional:
                 hx = hx.reshape(
                     self.num_layers, self.batch_size * 2, self.hidden_size
                 )
+
+        # The last hidden state of each layer
+        out_dim = (
+            self.hidden_size * 2 if self.bidirectional else self.hidden_size
+        )
+        h = x.new_empty(self.num_layers, x.shape[0], out_dim)
+
         # Processing the different layers
         for i, ligru_lay in enumerate(self.rnn):
             if hx is not None:
                 x = ligru_lay(x, hx=hx[i])
             else:
                 x = ligru_lay(x, hx=None)
-            h.append(x[:, -1, :])
-        h = torch.stack(h, dim=1)
+            h[i] = x[:, -1, :]
 
         if self.bidirectional:
-            h = h.reshape(h.shape[1] * 2, h.shape[0], self.hidden_size)
-        else:
-            h = h.transpose(0, 1)
+            h = h.transpose(0, 1).reshape(
+                h.shape[0] * 2, h.shape[1], self.hidden_size
+            )
 
         return x, h
 
@@ -1044,17 +973,15 @@ class CLiGRU_Layer(torch.nn.Module):
             self.norm = CLayerNorm(input_size=hidden_size * 2, dim=-1)
             self.normalize = True
 
-        # Initial state
-        self.h_init = torch.zeros(1, self.hidden_size * 2, requires_grad=False)
-
-        # Preloading dropout masks (gives some speed improvement)
-        self._init_drop(self.batch_size)
+        # Initial state, a non-persistent buffer so that it follows the
+        # module to its device without changing the checkpoint keys
+        self.register_buffer(
+            "h_init", torch.zeros(1, self.hidden_size * 2), persistent=False
+        )
 
         # Initializing dropout
         self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
 
-        self.drop_mask_te = torch.tensor([1.0]).float()
-
         # Setting the activation function
         if self.nonlinearity == "tanh":
             self.act = torch.nn.Tanh()
@@ -1062,7 +989,7 @@ class CLiGRU_Layer(torch.nn.Module):
             self.act = torch.nn.ReLU()
 
     def forward(self, x, hx=None):
-        # type: (Tensor, Optional[Tensor], Optional[Bool]) -> Tensor # noqa F821
+        # type: (Tensor, Optional[Tensor]) -> Tensor # noqa F821
         """Returns the output of the Complex liGRU layer.
 
         Arguments
@@ -1071,16 +998,14 @@ class CLiGRU_Layer(torch.nn.Module):
             Input tensor.
         """
 
-        if self.bidirectional:
-            x_flip = x.flip(1)
-            x = torch.cat([x, x_flip], dim=0)
-
-        # Change batch size if needed
-        self._change_batch_size(x)
-
         # Feed-forward affine transformations (all steps in parallel)
         w = self.w(x)
 
+        # The transformation is applied to each step independently, so the
+        # backward direction reuses the projections of the forward one
+        if self.bidirectional:
+            w = torch.cat([w, w.flip(1)], dim=0)
+
         # Apply batch normalization
         if self.normalize:
             w_bn = self.norm(w.reshape(w.shape[0] * w.shape[1], w.shape[2]))
@@ -1108,75 +1033,33 @@ class CLiGRU_Layer(torch.nn.Module):
             Linearly transformed input.
         """
 
-        hiddens = []
-
         # Sampling dropout mask
-        drop_mask = self._sample_drop_mask()
+        drop_mask = self._sample_drop_mask(w)
+
+        # The recurrent weights are assembled once for the whole sequence
+        u = complex_weight_matrix(self.u.real_weight, self.u.imag_weight)
+        ht = ht.expand(w.shape[0], -1)
+
+        # The hidden states of all the steps are written to a single buffer
+        h = w.new_empty(w.shape[0], w.shape[1], ht.shape[-1])
 
         # Loop over time axis
         for k in range(w.shape[1]):
-            gates = w[:, k] + self.u(ht)
-            atr, ati, ztr, zti = gates.chunk(4, 1)
-            at = torch.cat([atr, ati], dim=-1)
-            zt = torch.cat([ztr, zti], dim=-1)
+            gates = torch.addmm(w[:, k], ht, u)
+            # The real and imaginary parts of each gate are adjacent in the
+            # packed output, so each gate is a view of a single slice
+            at, zt = gates.chunk(2, 1)
             zt = torch.sigmoid(zt)
             hcand = self.act(at) * drop_mask
             ht = zt * ht + (1 - zt) * hcand
-            hiddens.append(ht)
+            h[:, k] = ht
 
-        # Stacking hidden states
-        h = torch.stack(hiddens, dim=1)
         return h
 
-    def _init_drop(self, batch_size):
-        """Initializes the recurrent dropout operation. To speed it up,
-        the dropout masks are sampled in advance.
+    def _sample_drop_mask(self, w):
+        """Samples the recurrent dropout mask of the batch, shared by all the
+        time steps.
         """
-
-        self.drop = torch.nn.Dropout(p=self.dropout, inplace=False)
-        self.drop_mask_te = torch.tensor([1.0]).float()
-
-        self.N_drop_masks = 16000
-        self.drop_mask_cnt = 0
-
-        self.drop_masks = self.drop(
-            torch.ones(self.N_drop_masks, self.hidden_size * 2)
-        ).data
-
-    def _sample_drop_mask(self,):
-        """Selects one of the pre-defined dropout masks.
-        """
-        if self.training:
-
-            # Sample new masks when needed
-            if self.drop_mask_cnt + self.batch_size > self.N_drop_masks:
-                self.drop_mask_cnt = 0
-                self.drop_masks = self.drop(
-                    torch.ones(self.N_drop_masks, self.hidden_size * 2,)
-                ).data
-
-            # Sampling the mask
-            drop_mask = self.drop_masks[
-                self.drop_mask_cnt : self.drop_mask_cnt + self.batch_size
-            ]
-            self.drop_mask_cnt = self.drop_mask_cnt + self.batch_size
-
-        else:
-            drop_mask = self.drop_mask_te
-
-        return drop_mask
-
-    def _change_batch_size(self, x):
-        """This function changes the batch size when it is different from
-        the one detected in the initialization method. This might happen in
-        the case of multi-gpu or when we have different batch sizes in train
-        and test. We also update the h_int and drop masks.
-        """
-
-        if self.batch_size != x.shape[0]:
-            self.batch_size = x.shape[0]
-
-            if self.training:
-                self.drop_masks = self.drop(
-                    torch.ones(self.N_drop_masks, self.hidden_size)
-                ).data
+        if self.training and self.dropout > 0:
+            return self.drop(w.new_ones(w.shape[0], self.hidden_size * 2))
+        return w.new_ones(())
@@ -94,6 +94,7 @@ class CLinear(torch.nn.Module):
 
         if self.bias:
             self.b = torch.nn.Parameter(torch.Tensor(2 * self.out_features))
+            self.b.data.fill_(0)
         else:
             self.b = torch.Tensor(2 * self.out_features).requires_grad_(False)
 
@@ -111,6 +111,27 @@ def get_conjugate(input, input_type="linear", channels_axis=1):
         return torch.cat([input_real, -input_imag], dim=channels_axis)
 
 
+def complex_weight_matrix(real_weight, imag_weight):
+    """Returns the real-valued matrix of a complex linear transformation.
+
+    Arguments
+    ---------
+    real_weight : torch.Parameter
+        Real part of the complex weight matrix.
+    imag_weight : torch.Parameter
+        Imaginary part of the complex weight matrix.
+
+    Example
+    -------
+    >>> real, imag = torch.ones(2, 3), torch.zeros(2, 3)
+    >>> complex_weight_matrix(real, imag).shape
+    torch.Size([4, 6])
+    """
+    cat_real = torch.cat([real_weight, -imag_weight], dim=0)
+    cat_imag = torch.cat([imag_weight, real_weight], dim=0)
+    return torch.cat([cat_real, cat_imag], dim=1)
+
+
 def complex_linear_op(input, real_weight, imag_weight, bias):
     """
     Applies a complex linear transformation to the incoming data.
@@ -126,9 +147,7 @@ def complex_linear_op(input, real_weight, imag_weight, bias):
     bias : torch.Parameter
     """
 
-    cat_real = torch.cat([real_weight, -imag_weight], dim=0)
-    cat_imag = torch.cat([imag_weight, real_weight], dim=0)
-    cat_complex = torch.cat([cat_real, cat_imag], dim=1)
+    cat_complex = complex_weight_matrix(real_weight, imag_weight)
 
     # If the input is already [batch*time, N]
     if input.dim() == 2:
@@ -248,8 +248,7 @@ class ConnectBlocks(torch.nn.Module):
     shortcut_combine_fn : str or function
         Either a pre-defined function (one of "add", "sub", "mul", "div",
         "avg", "cat") or a user-defined function that takes the shortcut
-        and next input, and combines them, as well as `init_params`
-        in case parameters need to be initialized inside of the function.
+        and next input, and combines them.
 
     Example
     -------
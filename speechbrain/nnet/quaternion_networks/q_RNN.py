@@ -6,6 +6,7 @@ Authors
 
 import torch
 import logging
+import numpy as np
 from speechbrain.nnet.quaternion_networks.q_linear import QLinear
 from speechbrain.nnet.quaternion_networks.q_normalization import QBatchNorm
 from torch import Tensor
@@ -92,7 +93,7 @@ class QLSTM(torch.nn.Module):
             self.reshape = True
 
         # Computing the feature dimensionality
-        self.fea_dim = torch.prod(torch.tensor(input_shape[2:]))
+        self.fea_dim = int(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
 
         self.rnn = self._init_layers()
@@ -498,7 +499,7 @@ class QRNN(torch.nn.Module):
             self.reshape = True
 
         # Computing the feature dimensionality
-        self.fea_dim = torch.prod(torch.tensor(input_shape[2:]))
+        self.fea_dim = int(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
 
         self.rnn = self._init_layers()
@@ -893,7 +894,7 @@ class QLiGRU(torch.nn.Module):
         if len(input_shape) > 3:
             self.reshape = True
 
-        self.fea_dim = torch.prod(torch.tensor(input_shape[2:]))
+        self.fea_dim = int(np.prod(input_shape[2:]))
         self.batch_size = input_shape[0]
         self.rnn = self._init_layers()
 
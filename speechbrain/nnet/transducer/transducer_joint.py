@@ -45,15 +45,6 @@ class Transducer_joint(nn.Module):
         self.joint = joint
         self.nonlinearity = nonlinearity()
 
-    def init_params(self, first_input):
-        """
-        Arguments
-        ---------
-        first_input : tensor
-            A first input used for initializing the parameters.
-        """
-        self.joint_network(first_input)
-
     def forward(self, input_TN, input_PN):
         """Returns the fusion of inputs tensors.
 
@@ -73,7 +64,7 @@ class Transducer_joint(nn.Module):
         if self.joint == "sum":
             joint = input_TN + input_PN
 
-        if self.joint == "concat":
+        elif self.joint == "concat":
             # For training
             if len(input_TN.shape) == 4:
                 dim = len(input_TN.shape) - 1
@@ -82,14 +73,17 @@ class Transducer_joint(nn.Module):
                 sz = [
                     max(i, j) for i, j in zip(xs.size()[:-1], ymat.size()[:-1])
                 ]
-                xs = xs.expand(torch.Size(sz + [xs.shape[-1]]))
-                ymat = ymat.expand(torch.Size(sz + [ymat.shape[-1]]))
+                xs = xs.expand(sz + [xs.shape[-1]])
+                ymat = ymat.expand(sz + [ymat.shape[-1]])
                 joint = torch.cat((xs, ymat), dim=dim)
             # For evaluation
-            elif len(input_TN.shape) == 1:
+            else:
                 joint = torch.cat((input_TN, input_PN), dim=0)
 
             if self.joint_network is not None:
                 joint = self.joint_network(joint)
 
+        else:
+            raise ValueError("joint must be either 'sum' or 'concat'")
+
         return self.nonlinearity(joint)
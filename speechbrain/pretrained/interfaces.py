@@ -148,6 +148,10 @@ class Pretrained:
         if self.jit_module_keys is None:
             return
 
+        # The scripted modules (e.g. LiGRU) run with the legacy executor,
+        # which is only switched on (for the whole process) when needed
+        torch._C._jit_set_profiling_executor(False)
+        torch._C._jit_set_profiling_mode(False)
         for name in self.jit_module_keys:
             if name not in self.modules:
                 raise ValueError(
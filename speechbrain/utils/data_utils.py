@@ -407,6 +407,19 @@ def batch_pad_right(tensors: list, mode="constant", value=0):
                 )
         max_shape.append(max([x.shape[dim] for x in tensors]))
 
+    if mode == "constant":
+        # pad_sequence pads the first dimension in a single native call, so
+        # the padded (last) dimension is moved first and back again.
+        batched = torch.nn.utils.rnn.pad_sequence(
+            [t.movedim(-1, 0) for t in tensors],
+            batch_first=True,
+            padding_value=value,
+        ).movedim(1, -1)
+        if batched.ndim > 2:
+            batched = batched.contiguous()
+        valid = [t.shape[0] / max_shape[0] for t in tensors]
+        return batched, torch.tensor(valid)
+
     batched = []
     valid = []
     for t in tensors:
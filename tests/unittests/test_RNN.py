@@ -171,3 +171,102 @@ def test_RNN():
         torch.lt(torch.add(hn_t[1], -hn[1]), 1e-3)
     ), "RNNCell hidden states mismatch"
     assert torch.jit.trace(rnn, inputs)
+
+
+def test_complex_RNN_script():
+
+    from speechbrain.nnet.complex_networks.c_RNN import CLSTM, CRNN
+
+    inputs = torch.randn(4, 3, 10)
+    for rnn_class in (CLSTM, CRNN):
+        net = rnn_class(
+            hidden_size=5,
+            input_shape=inputs.shape,
+            num_layers=2,
+            bidirectional=True,
+            return_hidden=True,
+        ).eval()
+        output, hn = net(inputs)
+        output_script, hn_script = torch.jit.script(net)(inputs)
+        assert torch.allclose(output, output_script)
+        assert torch.allclose(hn, hn_script)
+
+
+def test_RNNCell_script():
+
+    from speechbrain.nnet.RNN import RNNCell, GRUCell, LSTMCell
+
+    inputs = torch.randn(4, 10)
+    for cell_class in (RNNCell, GRUCell, LSTMCell):
+        net = cell_class(hidden_size=5, input_size=10, num_layers=2).eval()
+        output, hidden = net(inputs)
+        output_script, hidden_script = torch.jit.script(net)(inputs)
+        assert torch.allclose(output, output_script)
+        if cell_class is LSTMCell:
+            hidden, hidden_script = hidden[1], hidden_script[1]
+        assert torch.allclose(hidden, hidden_script)
+
+
+def test_rnn_quantize():
+
+    from speechbrain.nnet.RNN import LSTM, GRU, LiGRU, rnn_quantize
+
+    torch.manual_seed(0)
+    inputs = torch.randn(4, 10, 20)
+    for rnn_class in (LSTM, GRU):
+        net = rnn_class(hidden_size=16, input_shape=inputs.shape).eval()
+        output, _ = net(inputs)
+        net = rnn_quantize(net)
+        assert not isinstance(net.rnn, (torch.nn.LSTM, torch.nn.GRU))
+        output_quantized, _ = net(inputs)
+        assert torch.allclose(output, output_quantized, atol=0.05)
+
+    net = LiGRU(hidden_size=16, input_shape=inputs.shape).eval()
+    output, _ = net(inputs)
+    net = rnn_quantize(net)
+    assert not isinstance(net.rnn[0].w, torch.nn.Linear)
+    assert isinstance(net.rnn[0].u, torch.nn.Linear)
+    output_quantized, _ = net(inputs)
+    assert torch.allclose(output, output_quantized, atol=0.05)
+
+
+def test_RNN_bfloat16():
+
+    from speechbrain.nnet.RNN import RNN, LSTM, GRU
+
+    inputs = torch.randn(4, 10, 20)
+    for rnn_class in (RNN, LSTM, GRU):
+        net = rnn_class(hidden_size=5, input_shape=inputs.shape).eval()
+        output, _ = net(inputs)
+        net = net.to(torch.bfloat16)
+        output_bf16, _ = net(inputs, lengths=torch.ones(4))
+        assert output_bf16.dtype == torch.bfloat16
+        assert torch.allclose(output, output_bf16.float(), atol=0.05)
+
+
+def test_LiGRU_drop_mask():
+
+    from speechbrain.nnet.RNN import LiGRU
+
+    torch.manual_seed(0)
+    inputs = torch.randn(4, 10, 20)
+    net = LiGRU(hidden_size=5, input_shape=inputs.shape, dropout=0.5)
+    output, _ = net(inputs)
+    assert output.shape == (4, 10, 5)
+
+    # Checkpoints of older versions also store pre-sampled dropout masks
+    state_dict = net.state_dict()
+    state_dict["rnn.0.drop_masks"] = torch.ones(16000, 5)
+    net.load_state_dict(state_dict, strict=True)
+
+
+def test_QuasiRNN_zoneout():
+
+    from speechbrain.nnet.RNN import QuasiRNN
+
+    torch.manual_seed(0)
+    inputs = torch.randn(4, 10, 20)
+    net = QuasiRNN(hidden_size=5, input_shape=inputs.shape, zoneout=0.5)
+    output, _ = net(inputs)
+    output.sum().backward()
+    assert output.shape == (4, 10, 5)
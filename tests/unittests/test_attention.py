@@ -0,0 +1,224 @@
+import torch
+
+
+def test_attention_grouped_queries():
+
+    from speechbrain.nnet.attention import (
+        ContentBasedAttention,
+        LocationAwareAttention,
+        KeyValueAttention,
+    )
+
+    torch.manual_seed(0)
+    enc_states = torch.rand([2, 6, 7])
+    enc_len = torch.tensor([6, 4])
+    dec_states = torch.rand([6, 5])
+
+    modules = [
+        ContentBasedAttention(enc_dim=7, dec_dim=5, attn_dim=4, output_dim=3),
+        LocationAwareAttention(
+            enc_dim=7,
+            dec_dim=5,
+            attn_dim=4,
+            output_dim=3,
+            conv_channels=2,
+            kernel_size=3,
+        ),
+        KeyValueAttention(enc_dim=7, dec_dim=5, attn_dim=4, output_dim=3,),
+    ]
+    for attn in modules:
+        # Three queries per sentence, against shared or repeated encoder states
+        attn.reset()
+        context, weights = attn(enc_states, enc_len, dec_states)
+        attn.reset()
+        context_ref, weights_ref = attn(
+            enc_states.repeat_interleave(3, 0),
+            enc_len.repeat_interleave(3, 0),
+            dec_states,
+        )
+        assert context.shape == context_ref.shape == (6, 3)
+        assert weights.shape == weights_ref.shape
+        assert torch.allclose(context, context_ref, atol=1e-6)
+        assert torch.allclose(weights, weights_ref, atol=1e-6)
+
+
+def test_MultiheadAttention_without_weights():
+
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    inputs = torch.rand([3, 5, 8])
+    key_padding_mask = torch.zeros([3, 5], dtype=torch.bool)
+    key_padding_mask[1, 3:] = True
+    output, attn = net(
+        inputs, inputs, inputs, key_padding_mask=key_padding_mask
+    )
+    output_fused, attn_fused = net(
+        inputs,
+        inputs,
+        inputs,
+        key_padding_mask=key_padding_mask,
+        return_attn_weights=False,
+    )
+    assert attn.shape == (3, 5, 5)
+    assert attn_fused is None
+    assert torch.allclose(output, output_fused, atol=1e-6)
+
+
+def test_MultiheadAttention_is_causal(monkeypatch):
+
+    import speechbrain.nnet.attention
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    inputs = torch.rand([3, 5, 8])
+    attn_mask = torch.triu(torch.full((5, 5), float("-inf")), diagonal=1)
+    output_ref, _ = net(inputs, inputs, inputs, attn_mask=attn_mask)
+    output, _ = net(
+        inputs,
+        inputs,
+        inputs,
+        attn_mask=attn_mask,
+        return_attn_weights=False,
+        is_causal=True,
+    )
+    assert torch.allclose(output, output_ref, atol=1e-6)
+
+    # The hint is dropped on torch < 2.0
+    monkeypatch.setattr(speechbrain.nnet.attention, "_MHA_IS_CAUSAL", False)
+    output, _ = net(inputs, inputs, inputs, attn_mask=attn_mask, is_causal=True)
+    assert torch.allclose(output, output_ref, atol=1e-6)
+
+
+def test_MultiheadAttention_kv_cache():
+
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    query = torch.rand([3, 4, 8])
+    memory = torch.rand([3, 6, 8])
+
+    # Reference without cache (training mode, no dropout)
+    output_ref, attn_ref = net(query, memory, memory)
+    net.eval()
+    for _ in range(2):
+        output, attn = net(query, memory, memory)
+        assert torch.allclose(output, output_ref, atol=1e-6)
+        assert torch.allclose(attn, attn_ref, atol=1e-6)
+
+    # Modifying the memory in place invalidates the cache
+    memory.mul_(2)
+    net.train()
+    output_ref, _ = net(query, memory, memory)
+    net.eval()
+    output, attn = net(query, memory, memory, return_attn_weights=False)
+    assert attn is None
+    assert torch.allclose(output, output_ref, atol=1e-6)
+
+
+def test_MultiheadAttention_kv_cache_inference_mode():
+
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    query = torch.rand([3, 4, 8])
+    memory = torch.rand([3, 6, 8])
+    output_ref, attn_ref = net(query, memory, memory)
+
+    # Inference tensors do not track their version counter
+    net.eval()
+    with torch.inference_mode():
+        memory = memory.clone()
+        for _ in range(2):
+            output, attn = net(query, memory, memory)
+            assert torch.allclose(output, output_ref, atol=1e-6)
+            assert torch.allclose(attn, attn_ref, atol=1e-6)
+
+
+def test_MultiheadAttention_attend_without_sdpa(monkeypatch):
+
+    import speechbrain.nnet.attention
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    net.eval()
+    query = torch.rand([3, 4, 8])
+    keys, values = net.project_kv(torch.rand([3, 6, 8]))
+    output_ref, _ = net.attend(query, keys, values)
+
+    # Explicit matmul/softmax fallback, for torch < 2.0
+    monkeypatch.setattr(speechbrain.nnet.attention, "_HAS_SDPA", False)
+    output, attn = net.attend(query, keys, values, return_attn_weights=False)
+    assert attn is None
+    assert torch.allclose(output, output_ref, atol=1e-6)
+
+
+def test_MultiheadAttention_script():
+
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    scripted = torch.jit.script(net)
+    inputs = torch.rand([3, 5, 8])
+    output, attn = net(inputs, inputs, inputs)
+    output_scripted, attn_scripted = scripted(inputs, inputs, inputs)
+    assert torch.allclose(output, output_scripted, atol=1e-6)
+    assert torch.allclose(attn, attn_scripted, atol=1e-6)
+
+
+def test_attention_autocast():
+
+    from speechbrain.nnet.attention import ContentBasedAttention
+
+    torch.manual_seed(0)
+    net = ContentBasedAttention(enc_dim=7, dec_dim=5, attn_dim=4, output_dim=3)
+    enc_states = torch.rand([2, 60, 7])
+    enc_len = torch.tensor([1.0, 0.5])
+    dec_states = torch.rand([2, 5])
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        context, weights = net(enc_states, enc_len, dec_states)
+
+    # The attention softmax is computed in float32
+    assert context.dtype == torch.bfloat16
+    assert weights.dtype == torch.float32
+    assert torch.allclose(weights.sum(-1), torch.ones(2))
+
+
+def test_MultiheadAttention_autocast():
+
+    from speechbrain.nnet.attention import MultiheadAttention
+
+    torch.manual_seed(0)
+    net = MultiheadAttention(nhead=2, d_model=8)
+    inputs = torch.rand([3, 5, 8])
+    attn_mask = torch.triu(torch.full((5, 5), float("-inf")), diagonal=1)
+    key_padding_mask = torch.zeros([3, 5], dtype=torch.bool)
+    key_padding_mask[1, 3:] = True
+    output_ref, _ = net(
+        inputs,
+        inputs,
+        inputs,
+        attn_mask=attn_mask,
+        key_padding_mask=key_padding_mask,
+    )
+
+    # The float lookahead mask is used with bfloat16 projections
+    with torch.autocast("cpu", dtype=torch.bfloat16):
+        output, attn = net(
+            inputs,
+            inputs,
+            inputs,
+            attn_mask=attn_mask,
+            key_padding_mask=key_padding_mask,
+            return_attn_weights=False,
+            is_causal=True,
+        )
+    assert output.dtype == torch.bfloat16
+    assert attn is None
+    assert torch.allclose(output.float(), output_ref, atol=5e-2)
@@ -36,3 +36,14 @@ def test_brain():
     end_output = brain.compute_forward(inputs, Stage.VALID)
     end_loss = brain.compute_objectives(end_output, targets, Stage.VALID)
     assert end_loss < start_loss
+
+
+def test_no_sync():
+    import torch
+    from speechbrain.core import Brain
+
+    model = torch.nn.Linear(in_features=10, out_features=10)
+    brain = Brain(modules={"model": model})
+    with brain.no_sync():
+        model(torch.rand(2, 10)).sum().backward()
+    assert model.weight.grad is not None
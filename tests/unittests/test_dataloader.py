@@ -54,3 +54,23 @@ def test_saveable_dataloader_multiprocess(tmpdir):
         assert second_second_item == second_item
         del new_data_iterator
         del new_dataloader
+
+
+def test_prefetch_loader():
+    from speechbrain.dataio.dataloader import SaveableDataLoader
+    from speechbrain.dataio.dataloader import PrefetchLoader
+    from speechbrain.dataio.batch import PaddedBatch
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    dataset = [{"id": str(i), "x": torch.ones(i + 1)} for i in range(5)]
+    dataloader = SaveableDataLoader(
+        dataset, batch_size=2, collate_fn=PaddedBatch
+    )
+    prefetcher = PrefetchLoader(dataloader, device)
+    assert len(prefetcher) == len(dataloader)
+    batches = list(prefetcher)
+    assert len(batches) == 3
+    for batch, ref in zip(batches, dataloader):
+        assert batch.id == ref.id
+        assert batch.x.data.device.type == device
+        assert torch.equal(batch.x.data.cpu(), ref.x.data)
@@ -0,0 +1,85 @@
+import torch
+import torchaudio
+
+
+def _write_csv(tmpdir):
+    wavs = [torch.rand(1, 1600) * 2 - 1, torch.rand(1, 800) * 2 - 1]
+    lines = [
+        "ID, duration, wav, wav_format, wav_opts, spk, spk_format, spk_opts"
+    ]
+    for i, wav in enumerate(wavs):
+        path = str(tmpdir) + f"/utt{i}.wav"
+        torchaudio.save(path, wav, 16000)
+        duration = wav.shape[1] / 16000
+        lines.append(
+            f"utt{i}, {duration}, $root/utt{i}.wav, wav, , s{i}, string, "
+        )
+    csvpath = str(tmpdir) + "/data.csv"
+    with open(csvpath, "w") as fo:
+        fo.write("\n".join(lines) + "\n")
+    return csvpath
+
+
+def test_extended_csv_dataset(tmpdir):
+    from speechbrain.dataio.legacy import ExtendedCSVDataset
+
+    csvpath = _write_csv(tmpdir)
+    dataset = ExtendedCSVDataset(
+        csvpath,
+        replacements={"root": str(tmpdir)},
+        sorting="ascending",
+        output_keys=["wav", "spk"],
+    )
+    assert dataset[0]["wav"].shape == (800,)
+    assert dataset[0]["spk"] == ["s1"]
+
+    cached = ExtendedCSVDataset(
+        csvpath,
+        replacements={"root": str(tmpdir)},
+        sorting="ascending",
+        output_keys=["wav", "spk"],
+        cache=True,
+    )
+    for i in range(len(dataset)):
+        assert torch.equal(cached[i]["wav"], dataset[i]["wav"])
+        assert cached[i]["spk"] == dataset[i]["spk"]
+
+
+def test_extended_csv_dataset_sorting(tmpdir):
+    from speechbrain.dataio.legacy import ExtendedCSVDataset
+
+    csvpath = _write_csv(tmpdir)
+    for sorting, order in [
+        ("original", ["utt0", "utt1"]),
+        ("ascending", ["utt1", "utt0"]),
+        ("descending", ["utt0", "utt1"]),
+    ]:
+        dataset = ExtendedCSVDataset(
+            csvpath, replacements={"root": str(tmpdir)}, sorting=sorting
+        )
+        assert dataset.data_ids == order
+
+
+def test_read_pkl(tmpdir):
+    import pickle
+    import pytest
+    from speechbrain.dataio.legacy import read_pkl
+
+    path = str(tmpdir) + "/data.pkl"
+    for data, lab2ind, expected in [
+        ([0.5, 1.5], None, torch.tensor([0.5, 1.5])),
+        ([1, 2, 3], None, torch.tensor([1, 2, 3])),
+        (["a", "b", "a"], {"a": 0, "b": 1}, torch.tensor([0, 1, 0])),
+        (torch.tensor([0.5], dtype=torch.float64), None, torch.tensor([0.5])),
+        (torch.tensor([1, 2]), None, torch.tensor([1, 2], dtype=torch.int32)),
+    ]:
+        with open(path, "wb") as fo:
+            pickle.dump(data, fo)
+        tensor = read_pkl(path, lab2ind=lab2ind)
+        assert tensor.dtype == expected.dtype
+        assert torch.equal(tensor, expected)
+
+    with open(path, "wb") as fo:
+        pickle.dump([None], fo)
+    with pytest.raises(ValueError):
+        read_pkl(path)
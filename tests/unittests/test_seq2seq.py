@@ -0,0 +1,99 @@
+import torch
+
+
+def test_S2SRNNBeamSearcher_log_probs():
+
+    import speechbrain as sb
+    from speechbrain.decoders.seq2seq import S2SRNNBeamSearcher
+
+    torch.manual_seed(0)
+    emb = torch.nn.Embedding(5, 3)
+    dec = sb.nnet.RNN.AttentionalRNNDecoder(
+        "gru", "content", 3, 3, 1, enc_dim=7, input_size=3
+    )
+    lin = sb.nnet.linear.Linear(n_neurons=5, input_size=3)
+    searcher = S2SRNNBeamSearcher(
+        embedding=emb,
+        decoder=dec,
+        linear=lin,
+        bos_index=4,
+        eos_index=4,
+        min_decode_ratio=0,
+        max_decode_ratio=1,
+        beam_size=3,
+        topk=2,
+        return_log_probs=True,
+    )
+    enc = torch.rand([2, 6, 7])
+    wav_len = torch.ones([2])
+    hyps, scores, log_probs = searcher(enc, wav_len)
+
+    assert len(hyps) == 2
+    assert scores.shape == (2, 2)
+    assert len(log_probs) == 2 * 2
+    for hyp, hyp_log_probs in zip(hyps, log_probs[::2]):
+        # The log-probabilities of the best hypothesis, eos included
+        assert hyp_log_probs.is_floating_point()
+        assert len(hyp) <= hyp_log_probs.shape[0] <= len(hyp) + 1
+        assert torch.all(hyp_log_probs <= 0)
+
+
+def test_S2SRNNBeamSearcher_autocast():
+
+    import speechbrain as sb
+    from speechbrain.decoders.seq2seq import S2SRNNBeamSearcher
+
+    torch.manual_seed(0)
+    emb = torch.nn.Embedding(5, 3)
+    dec = sb.nnet.RNN.AttentionalRNNDecoder(
+        "gru", "content", 3, 3, 1, enc_dim=7, input_size=3
+    )
+    lin = sb.nnet.linear.Linear(n_neurons=5, input_size=3)
+    enc = torch.rand([2, 6, 7])
+    # float16 is not supported by CPU autocast, and runs in float32
+    for autocast_dtype in ["bfloat16", "float16"]:
+        searcher = S2SRNNBeamSearcher(
+            embedding=emb,
+            decoder=dec,
+            linear=lin,
+            bos_index=4,
+            eos_index=4,
+            min_decode_ratio=0,
+            max_decode_ratio=1,
+            beam_size=3,
+            autocast_dtype=autocast_dtype,
+        )
+        log_probs, _, _ = searcher.forward_step(
+            torch.full((6,), 4),
+            searcher.reset_mem(6, enc.device),
+            enc,
+            torch.tensor([6, 6]),
+        )
+        assert log_probs.dtype == torch.float32
+        hyps, scores = searcher(enc, torch.ones([2]))
+        assert len(hyps) == 2
+        assert scores.dtype == torch.float32
+
+
+def test_S2SGreedySearcher_early_exit():
+
+    from speechbrain.decoders.seq2seq import S2SGreedySearcher
+
+    class CountingSearcher(S2SGreedySearcher):
+        """Emits token 1 then eos (0) for every sentence."""
+
+        def reset_mem(self, batch_size, device):
+            return 0
+
+        def forward_step(self, inp_tokens, memory, enc_states, enc_lens):
+            log_probs = torch.full((inp_tokens.shape[0], 3), -10.0)
+            log_probs[:, 1 if memory == 0 else 0] = -1.0
+            return log_probs, memory + 1, None
+
+    searcher = CountingSearcher(
+        bos_index=2, eos_index=0, min_decode_ratio=0, max_decode_ratio=1
+    )
+    hyps, scores = searcher(torch.rand([2, 10, 4]), torch.ones([2]))
+    assert hyps == [[1], [1]]
+    # Decoding stops at the step where all sentences reached eos
+    assert scores == [-2.0, -2.0]
@@ -0,0 +1,43 @@
+import torch
+
+
+def test_lookahead_mask_inference_mode():
+
+    from speechbrain.lobes.models.transformer.Transformer import (
+        get_lookahead_mask,
+    )
+
+    tokens = torch.ones([2, 37], dtype=torch.long)
+    with torch.inference_mode():
+        mask_inference = get_lookahead_mask(tokens)
+    mask = get_lookahead_mask(tokens)
+    assert not mask.is_inference()
+    assert torch.equal(mask, mask_inference)
+    assert torch.equal(mask, torch.triu(torch.full((37, 37), -float("inf")), 1))
+    assert torch.equal(get_lookahead_mask(tokens[:, :3]), mask[:3, :3])
+
+    # The mask can be saved for backward
+    scores = torch.rand([37, 37], requires_grad=True)
+    (scores * mask.exp()).sum().backward()
+    assert torch.equal(scores.grad, mask.exp())
+
+
+def test_PositionalEncoding_inference_mode():
+
+    from speechbrain.lobes.models.transformer.Transformer import (
+        PositionalEncoding,
+    )
+
+    enc = PositionalEncoding(input_size=8)
+    inputs = torch.rand([2, 5, 8], dtype=torch.float64)
+    with torch.inference_mode():
+        pe_inference = enc(inputs)
+    pe = enc(inputs)
+    assert pe.dtype == torch.float64
+    assert not pe.is_inference()
+    assert torch.equal(pe, pe_inference)
+
+    # The cast table can be saved for backward
+    inputs.requires_grad_()
+    (inputs * pe).sum().backward()
+    assert torch.equal(inputs.grad, pe.expand_as(inputs))